@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+In-process load benchmark for the API
+
+Runs the ASGI app through httpx's ASGITransport against an in-memory local
+store seeded with each dataset size. Every endpoint is driven at each
+concurrency level, and throughput plus latency percentiles are recorded.
+Results are saved as JSON and can be compared against a saved baseline.
+The exit status is 1 when any scenario regressed beyond the tolerance.
+
+Usage:
+  python benchmarks/load.py --sizes 1000,100000 --concurrency 1,16,64 --output results.json
+  python benchmarks/load.py --baseline baseline.json
+  python benchmarks/load.py --sizes 1000000 --requests 200   # needs several GB of RAM
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+# Configure the app before it is imported: memory-only store, quiet logs,
+# no background batching, profiling or rate limiting
+os.environ.update({
+    'DATABASE_BACKEND': 'local',
+    'LOCAL_DB_PATH': '',
+    'WRITE_BEHIND_ENABLED': 'False',
+    'PROFILING_ENABLED': 'False',
+    'DEBUG': 'False',
+    'LOG_LEVEL': 'WARNING',
+    'RATE_LIMIT_ENABLED': 'False',
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import server
+from database import firebase_db
+
+SEED_CHUNK = 10000
+SLOTS_PER_DAY = 24 * 60 // 30
+FIRST_SEEDED_DATE = date(2030, 1, 1)
+FIRST_BOOKED_DATE = date(2200, 1, 1)
+
+# Slots taken by benchmark bookings, shared across dataset sizes
+_booking_counter = itertools.count()
+
+
+def _seed_documents(collection: str, start: int, stop: int):
+    """Yield (id, data) for seeded documents numbered ``start`` to ``stop``"""
+    base = datetime(2026, 1, 1)
+    for i in range(start, stop):
+        created = base + timedelta(seconds=i)
+        if collection == 'status_checks':
+            data = {'client_name': f'client-{i}', 'message': None, 'timestamp': created}
+        elif collection == 'contact_forms':
+            data = {
+                'first_name': 'Load', 'last_name': f'Test{i}', 'email': f'load{i}@example.com',
+                'phone': '5551234567', 'company': 'Bench Co', 'industry': 'Technology',
+                'service': 'Lead Generation', 'message': 'Seeded by the load benchmark',
+                'submitted_at': created, 'status': 'new' if i % 3 else 'contacted',
+            }
+        else:
+            day, slot = divmod(i, SLOTS_PER_DAY)
+            data = {
+                'name': f'Load Test {i}', 'email': f'load{i}@example.com', 'phone': '5551234567',
+                'business': 'Bench Co', 'industry': 'Technology', 'service_interests': 'Lead Generation',
+                'appointment_date': (FIRST_SEEDED_DATE + timedelta(days=day)).isoformat(),
+                'appointment_time': f'{slot // 2:02d}:{slot % 2 * 30:02d}',
+                'duration_minutes': 30, 'end_time': f'{(slot + 1) // 2:02d}:{(slot + 1) % 2 * 30:02d}',
+                'consultant': None, 'message': None, 'created_at': created,
+                'status': ('pending', 'confirmed', 'completed', 'cancelled')[i % 4],
+            }
+        doc_id = str(uuid.UUID(int=i))
+        yield doc_id, {'id': doc_id, **data}
+
+
+def seed(store, current: int, size: int):
+    """Grow every collection from ``current`` to ``size`` documents"""
+    for collection in ('status_checks', 'contact_forms', 'appointments'):
+        for start in range(current, size, SEED_CHUNK):
+            stop = min(size, start + SEED_CHUNK)
+            store.commit([('set', collection, doc_id, data)
+                          for doc_id, data in _seed_documents(collection, start, stop)])
+
+
+class Scenario:
+    """One endpoint under load; ``request`` builds the n-th request"""
+
+    def __init__(self, name: str, request):
+        self.name = name
+        self.request = request
+
+
+def scenarios():
+    booked_date = FIRST_SEEDED_DATE.isoformat()
+    last_free_date = (FIRST_SEEDED_DATE + timedelta(days=90)).isoformat()
+
+    def new_appointment(n: int):
+        # Every booking takes a fresh slot far past the seeded dates
+        day, slot = divmod(next(_booking_counter), SLOTS_PER_DAY)
+        return ('POST', '/api/appointments', {
+            'name': 'Load Test', 'email': 'load@example.com', 'phone': '5551234567',
+            'appointment_date': (FIRST_BOOKED_DATE + timedelta(days=day)).isoformat(),
+            'appointment_time': f'{slot // 2:02d}:{slot % 2 * 30:02d}',
+        })
+
+    return [
+        Scenario('GET /health', lambda n: ('GET', '/health', None)),
+        Scenario('GET /api/status', lambda n: ('GET', '/api/status?limit=100', None)),
+        Scenario('GET /api/contact', lambda n: ('GET', '/api/contact?limit=100', None)),
+        Scenario('GET /api/contact?status_filter', lambda n: ('GET', '/api/contact?limit=100&status_filter=contacted', None)),
+        Scenario('GET /api/appointments', lambda n: ('GET', '/api/appointments?limit=100', None)),
+        Scenario('GET /api/appointments/availability', lambda n: ('GET', f'/api/appointments/availability?date={booked_date}', None)),
+        Scenario('GET /api/appointments/availability&time', lambda n: ('GET', f'/api/appointments/availability?date={booked_date}&time=10:00', None)),
+        Scenario('GET /api/appointments/free-slots', lambda n: ('GET', f'/api/appointments/free-slots?from={booked_date}&to={last_free_date}&limit=50', None)),
+        Scenario('GET /api/stats', lambda n: ('GET', '/api/stats', None)),
+        Scenario('POST /api/status', lambda n: ('POST', '/api/status', {'client_name': f'load-{n}'})),
+        Scenario('POST /api/contact', lambda n: ('POST', '/api/contact', {
+            'first_name': 'Load', 'last_name': 'Test', 'email': f'load{n}@example.com', 'message': 'Load benchmark',
+        })),
+        Scenario('POST /api/appointments', new_appointment),
+    ]
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int, total: int) -> dict:
+    """Issue ``total`` requests from ``concurrency`` workers and summarize them"""
+    latencies = []
+    errors = 0
+    issued = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for n in issued:
+            method, url, body = scenario.request(n)
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'endpoint': scenario.name,
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'rps': total / elapsed,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p90_ms': percentile(latencies, 0.90) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def run(sizes, concurrency_levels, total: int, only=None) -> list:
+    store = firebase_db.db.store
+    results = []
+    seeded = 0
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for size in sorted(sizes):
+            started = time.perf_counter()
+            seed(store, seeded, size)
+            seeded = size
+            await server.startup_event()
+            print(f"Seeded {size} documents per collection in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+            for scenario in scenarios():
+                if only and not any(part in scenario.name for part in only):
+                    continue
+                for concurrency in concurrency_levels:
+                    result = {'size': size, **await run_scenario(client, scenario, concurrency, total)}
+                    results.append(result)
+                    print(f"{size:>8} {concurrency:>4} {scenario.name:<42} {result['rps']:>9.0f} rps "
+                          f"p50 {result['p50_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms"
+                          + (f"  {result['errors']} errors" if result['errors'] else ''))
+    server.async_firebase_db.close()
+    return results
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Scenarios whose p99 grew or throughput fell by more than ``tolerance``"""
+    previous = {(r['size'], r['concurrency'], r['endpoint']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['size'], result['concurrency'], result['endpoint']))
+        if before is None:
+            continue
+        slower = result['p99_ms'] > before['p99_ms'] * (1 + tolerance)
+        fewer = result['rps'] < before['rps'] * (1 - tolerance)
+        if slower or fewer:
+            regressions.append({
+                'size': result['size'], 'concurrency': result['concurrency'], 'endpoint': result['endpoint'],
+                'p99_ms': [before['p99_ms'], result['p99_ms']], 'rps': [before['rps'], result['rps']],
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000', help='comma-separated documents per collection')
+    parser.add_argument('--concurrency', default='1,16,64', help='comma-separated concurrent clients')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--only', help='comma-separated substrings selecting endpoints')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results saved with --output')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p99/throughput change')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+    only = args.only.split(',') if args.only else None
+    results = asyncio.run(run(sizes, concurrency_levels, args.requests, only))
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'requests_per_scenario': args.requests,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['size']} x{regression['concurrency']} {regression['endpoint']}: "
+                  f"p99 {regression['p99_ms'][0]:.2f} -> {regression['p99_ms'][1]:.2f} ms, "
+                  f"{regression['rps'][0]:.0f} -> {regression['rps'][1]:.0f} rps")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the API's JSON responses
+
+Compares, per endpoint and on the same handler path, the time spent turning
+documents into a JSON body before and after the move to Pydantic v2
+serialization and orjson. The "before" side uses v1-style models (datetimes
+encoded through Config.json_encoders, .dict() copies) rendered by
+json.dumps; the "after" side uses field_serializer models, model_dump and
+orjson. Both run FastAPI's response_model validation wherever the handler
+does, so only the serialization change is measured:
+
+  GET ... (trusted)    TRUSTED_READS=True: projected rows, no response_model pass
+  GET ... (validated)  TRUSTED_READS=False: models rebuilt and validated as the response
+  POST ...             create, copy for storage, validate and encode the response
+
+Usage: python benchmarks/serialization.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import functools
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_model_field
+from pydantic import ConfigDict, create_model, model_validator
+
+from models import StatusCheck, ContactForm, Appointment
+from responses import DocumentsResponse, trusted_documents_response
+
+
+class StoredDocument:
+    """Minimal stand-in for a database snapshot"""
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+def make_documents(model, rows: int):
+    base = datetime(2026, 1, 1)
+    samples = {
+        StatusCheck: lambda i: {'client_name': f'client-{i}', 'message': 'ok', 'timestamp': base + timedelta(seconds=i)},
+        ContactForm: lambda i: {
+            'first_name': 'Ada', 'last_name': 'Lovelace', 'email': f'ada{i}@example.com',
+            'phone': '5551234567', 'company': 'Analytical Engines', 'industry': 'Technology',
+            'service': 'Lead Generation', 'message': 'Interested in a demo', 'status': 'new',
+            'submitted_at': base + timedelta(seconds=i),
+        },
+        Appointment: lambda i: {
+            'name': 'Ada Lovelace', 'email': f'ada{i}@example.com', 'phone': '5551234567',
+            'business': 'Analytical Engines', 'industry': 'Technology', 'service_interests': 'Lead Generation',
+            'appointment_date': '2026-02-01', 'appointment_time': '10:00', 'duration_minutes': 30,
+            'end_time': '10:30', 'consultant': None, 'message': None,
+            'status': 'pending', 'created_at': base + timedelta(seconds=i),
+        },
+    }
+    return [StoredDocument({'id': str(uuid.uuid4()), **samples[model](i)}) for i in range(rows)]
+
+
+def legacy_model(model):
+    """v1-style twin of ``model``: same fields and validators, datetimes encoded by Config.json_encoders"""
+    validators = {
+        name: model_validator(mode=decorator.info.mode)(decorator.func)
+        for name, decorator in model.__pydantic_decorators__.model_validators.items()
+    }
+    fields = {name: (info.annotation, info) for name, info in model.model_fields.items()}
+    return create_model(
+        f'Legacy{model.__name__}',
+        __config__=ConfigDict(json_encoders={datetime: lambda v: v.isoformat()}),
+        __validators__=validators,
+        **fields
+    )
+
+
+LEGACY_MODELS = {model: legacy_model(model) for model in (StatusCheck, ContactForm, Appointment)}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class LegacyTrustedResponse(JSONResponse):
+    """The trusted listing response as it was before orjson"""
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=None)
+def response_field(response_model):
+    """The route's response field, built once per route as FastAPI does"""
+    return create_model_field('Response', response_model, mode='serialization')
+
+
+def respond(response_model, content, response_class) -> bytes:
+    """What FastAPI does with a handler's return value: validate, serialize, render"""
+    field = response_field(response_model)
+    value, errors = field.validate(content, {}, loc=('response',))
+    if errors:
+        raise ValueError(errors)
+    return response_class(field.serialize(value)).body
+
+
+def legacy_trusted_list(docs, model):
+    fields = tuple(model.model_fields)
+    rows = [{field: doc.to_dict().get(field) for field in fields} for doc in docs]
+    return LegacyTrustedResponse(rows).body
+
+
+def current_trusted_list(docs, model):
+    return trusted_documents_response(docs, model).body
+
+
+def legacy_validated_list(docs, model):
+    legacy = LEGACY_MODELS[model]
+    return respond(List[legacy], [legacy(**doc.to_dict()) for doc in docs], JSONResponse)
+
+
+def current_validated_list(docs, model):
+    return respond(List[model], [model(**doc.to_dict()) for doc in docs], DocumentsResponse)
+
+
+def legacy_single(docs, model):
+    legacy = LEGACY_MODELS[model]
+    item = legacy(**docs[0].to_dict())
+    item.dict()
+    return respond(legacy, item, JSONResponse)
+
+
+def current_single(docs, model):
+    item = model(**docs[0].to_dict())
+    item.model_dump()
+    return respond(model, item, DocumentsResponse)
+
+
+ENDPOINTS = [
+    ('GET /api/status (trusted)', StatusCheck, legacy_trusted_list, current_trusted_list),
+    ('GET /api/contact (trusted)', ContactForm, legacy_trusted_list, current_trusted_list),
+    ('GET /api/appointments (trusted)', Appointment, legacy_trusted_list, current_trusted_list),
+    ('GET /api/status (validated)', StatusCheck, legacy_validated_list, current_validated_list),
+    ('GET /api/contact (validated)', ContactForm, legacy_validated_list, current_validated_list),
+    ('GET /api/appointments (validated)', Appointment, legacy_validated_list, current_validated_list),
+    ('POST /api/status', StatusCheck, legacy_single, current_single),
+    ('POST /api/contact', ContactForm, legacy_single, current_single),
+    ('POST /api/appointments', Appointment, legacy_single, current_single),
+]
+
+
+def measure(fn, docs, model, repeat: int) -> float:
+    """Median wall time of ``fn`` in milliseconds"""
+    fn(docs, model)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(docs, model)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    import warnings
+    warnings.simplefilter('ignore', DeprecationWarning)
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000, help='documents per list response')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per endpoint')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'endpoint':<34} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, model, legacy, current in ENDPOINTS:
+        docs = make_documents(model, args.rows if name.startswith('GET') else 1)
+        before = measure(legacy, docs, model, args.repeat)
+        after = measure(current, docs, model, args.repeat)
+        results.append({'endpoint': name, 'before_ms': before, 'after_ms': after})
+        print(f"{name:<34} {before:>10.3f} {after:>10.3f} {before / after:>7.1f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
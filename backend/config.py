@@ -13,6 +13,90 @@ class Settings:
     FIREBASE_CREDENTIALS_PATH = os.getenv('FIREBASE_CREDENTIALS_PATH', 'firebase-credentials.json')
     FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID')
     
+    # Database backend: 'local' (embedded store) or 'firestore' (Cloud Firestore,
+    # or the emulator when FIRESTORE_EMULATOR_HOST is set)
+    DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'local')
+    if FIREBASE_CREDENTIALS_PATH:
+        FIREBASE_CREDENTIALS_PATH = str(ROOT_DIR / FIREBASE_CREDENTIALS_PATH)
+    
+    # Local Database Configuration (empty path keeps data in memory only)
+    LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', 'data/local_db.jsonl')
+    if LOCAL_DB_PATH:
+        LOCAL_DB_PATH = str(ROOT_DIR / LOCAL_DB_PATH)
+    LOCAL_DB_FSYNC = os.getenv('LOCAL_DB_FSYNC', 'False').lower() == 'true'
+    
+    # Threads available for blocking database calls made from async handlers
+    DB_THREAD_POOL_SIZE = int(os.getenv('DB_THREAD_POOL_SIZE', '64'))
+    
+    # Write-behind batching for contact form and status check inserts
+    WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'False').lower() == 'true'
+    WRITE_BEHIND_SPOOL_PATH = str(ROOT_DIR / os.getenv('WRITE_BEHIND_SPOOL_PATH', 'data/write_behind.spool'))
+    WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', '500'))
+    WRITE_BEHIND_FLUSH_MS = int(os.getenv('WRITE_BEHIND_FLUSH_MS', '50'))
+    WRITE_BEHIND_MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', '10000'))
+    WRITE_BEHIND_FSYNC = os.getenv('WRITE_BEHIND_FSYNC', 'False').lower() == 'true'
+    
+    # Appointment slot length in minutes (must divide a day evenly)
+    SLOT_MINUTES = int(os.getenv('SLOT_MINUTES', '30'))
+    
+    # Opening hours offered by the free-slot search, e.g.
+    # "mon-fri 09:00-12:00,13:00-17:00; sat 10:00-14:00"
+    BUSINESS_HOURS = os.getenv('BUSINESS_HOURS', 'mon-sun 09:00-18:00')
+    
+    # IANA time zone that appointment dates, times and business hours are in
+    BUSINESS_TIMEZONE = os.getenv('BUSINESS_TIMEZONE', 'UTC')
+    
+    # Serve stored documents without re-validating them on read; disable if
+    # other tools write to the database
+    TRUSTED_READS = os.getenv('TRUSTED_READS', 'True').lower() == 'true'
+    
+    # Record request and database latency and serve it on /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    
+    # Sampled per-request cProfile dumps; in DEBUG an `X-Profile: 1` header
+    # also profiles a single request
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.01'))
+    PROFILING_DIR = str(ROOT_DIR / os.getenv('PROFILING_DIR', 'data/profiles'))
+    PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '100'))
+    
+    # Logging: 'json' or 'text' output, written from a background thread when
+    # LOG_ASYNC is on; LOG_INFO_SAMPLE_RATE keeps that fraction of info logs
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'True').lower() == 'true'
+    LOG_INFO_SAMPLE_RATE = float(os.getenv('LOG_INFO_SAMPLE_RATE', '1.0'))
+    
+    # Token-bucket limits on public form submissions, per client IP (per
+    # minute) and per email (per hour); trust X-Forwarded-For behind
+    # RATE_LIMIT_PROXY_HOPS reverse proxies
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_IP_PER_MINUTE = float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', '10'))
+    RATE_LIMIT_IP_BURST = int(os.getenv('RATE_LIMIT_IP_BURST', '20'))
+    RATE_LIMIT_EMAIL_PER_HOUR = float(os.getenv('RATE_LIMIT_EMAIL_PER_HOUR', '10'))
+    RATE_LIMIT_EMAIL_BURST = int(os.getenv('RATE_LIMIT_EMAIL_BURST', '5'))
+    RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'
+    RATE_LIMIT_PROXY_HOPS = int(os.getenv('RATE_LIMIT_PROXY_HOPS', '1'))
+    
+    # Bulk imports per client IP per hour, and rows read from one import
+    RATE_LIMIT_BULK_PER_HOUR = float(os.getenv('RATE_LIMIT_BULK_PER_HOUR', '10'))
+    RATE_LIMIT_BULK_BURST = int(os.getenv('RATE_LIMIT_BULK_BURST', '3'))
+    BULK_MAX_ROWS = int(os.getenv('BULK_MAX_ROWS', '10000'))
+    
+    # Server processes. More than one worker needs the firestore backend and
+    # SHARED_STATE_URL (redis://...) so workers see each other's bookings
+    HOST = os.getenv('HOST', '0.0.0.0')
+    PORT = int(os.getenv('PORT', '8001'))
+    WORKERS = int(os.getenv('WORKERS', '1'))
+    SHARED_STATE_URL = os.getenv('SHARED_STATE_URL', '')
+    
+    # Seconds between checks of a worker's slot index against the database,
+    # which repair slot changes lost in pub/sub delivery (0 disables)
+    SLOT_INDEX_RESYNC_SECONDS = float(os.getenv('SLOT_INDEX_RESYNC_SECONDS', '300'))
+    
+    # Auto-reload on code changes; honored only in DEBUG with a single worker
+    RELOAD = os.getenv('RELOAD', 'False').lower() == 'true'
+    
     # CORS Configuration
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
@@ -1,103 +1,247 @@
 """
 Firebase Firestore database configuration and utilities
 """
+import asyncio
+import base64
+import collections
+import functools
+import itertools
+import json
 import logging
-from typing import Optional, Dict, Any, List
-import uuid
-from datetime import datetime
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Union
+import uuid
+
+from config import settings
+from local_store import LocalStore, encode_value, decode_object
+from metrics import timed_db_operation
+from shared_state import InProcessState, create_shared_state
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single worker owns the spool
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
-class MockDocument:
-    """Mock Firestore document for development"""
-    def __init__(self, data: Dict[str, Any]):
+# Hash indexes declared on the local store, keyed by collection. Queries whose
+# equality/`in` filters cover an index only visit the matching documents.
+LOCAL_INDEXES = {
+    'appointments': [
+        ('appointment_date', 'consultant', 'status'),
+        ('appointment_date', 'status'),
+        ('status',),
+    ],
+    'contact_forms': [
+        ('status',),
+    ],
+}
+
+# Ordered indexes backing the admin listings' order_by(...).limit(n) queries
+LOCAL_SORTED_INDEXES = {
+    'status_checks': ['timestamp'],
+    'contact_forms': ['submitted_at'],
+    'appointments': ['created_at'],
+}
+
+CURSOR_ID_FIELD = '__name__'
+
+def encode_cursor(doc, field: str) -> str:
+    """Build an opaque pagination cursor pointing just after ``doc``"""
+    payload = json.dumps([field, doc.to_dict()[field], doc.id], default=encode_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, field: str) -> Dict[str, Any]:
+    """Turn a cursor into start_after() field values; raises ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_field, value, doc_id = json.loads(
+            base64.urlsafe_b64decode(padded.encode('ascii')), object_hook=decode_object
+        )
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if cursor_field != field:
+        raise ValueError(f"Cursor was issued for ordering by {cursor_field}, not {field}")
+    return {field: value, CURSOR_ID_FIELD: doc_id}
+
+class LocalDocument:
+    """Snapshot of a document read from the local store"""
+    def __init__(self, reference: 'LocalDocumentReference', data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.doc_id
         self._data = data
-        self.exists = True
+        self.exists = data is not None
     
     def to_dict(self):
         return self._data
     
-    def get(self):
-        return self
+    def get(self, field: str):
+        return (self._data or {}).get(field)
 
-class MockDocumentReference:
-    """Mock Firestore document reference for development"""
-    def __init__(self, collection_name: str, doc_id: str):
+class LocalDocumentReference:
+    """Reference to a single document in the local store"""
+    def __init__(self, store: LocalStore, collection_name: str, doc_id: str):
+        self._store = store
         self.collection_name = collection_name
         self.doc_id = doc_id
-        self._data = {}
     
-    def set(self, data: Dict[str, Any]):
-        self._data = data
-        logger.info(f"Mock: Set document {self.doc_id} in {self.collection_name}")
+    @property
+    def id(self):
+        return self.doc_id
+    
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._store.set(self.collection_name, self.doc_id, data, merge=merge)
+        logger.debug("Local: Set document %s in %s", self.doc_id, self.collection_name)
         return self
     
     def update(self, data: Dict[str, Any]):
-        self._data.update(data)
-        logger.info(f"Mock: Updated document {self.doc_id} in {self.collection_name}")
+        self._store.update(self.collection_name, self.doc_id, data)
+        logger.debug("Local: Updated document %s in %s", self.doc_id, self.collection_name)
+        return self
+    
+    def update_if_absent(self, data: Dict[str, Any], unique_fields: tuple, filters: list = (),
+                         interval: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
+        """Update unless the result conflicts on ``unique_fields``; see LocalStore.update_if_absent"""
+        return self._store.update_if_absent(self.collection_name, self.doc_id, data, unique_fields, filters, interval)
+    
+    def delete(self):
+        self._store.delete(self.collection_name, self.doc_id)
         return self
     
     def get(self):
-        if self._data:
-            return MockDocument(self._data)
-        else:
-            doc = MockDocument({})
-            doc.exists = False
-            return doc
+        return LocalDocument(self, self._store.get(self.collection_name, self.doc_id))
 
-class MockQuery:
-    """Mock Firestore query for development"""
-    def __init__(self, collection_name: str):
+class LocalQuery:
+    """Firestore-style query evaluated against the local store"""
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+    
+    def __init__(self, store: LocalStore, collection_name: str):
+        self._store = store
         self.collection_name = collection_name
         self._filters = []
         self._order_by = None
         self._limit_count = None
+        self._start_after = None
+    
+    def _copy(self) -> 'LocalQuery':
+        query = LocalQuery(self._store, self.collection_name)
+        query._filters = list(self._filters)
+        query._order_by = self._order_by
+        query._limit_count = self._limit_count
+        query._start_after = self._start_after
+        return query
     
     def where(self, field: str, op: str, value: Any):
-        self._filters.append((field, op, value))
-        return self
+        query = self._copy()
+        query._filters.append((field, op, value))
+        return query
     
     def order_by(self, field: str, direction: str = 'ASCENDING'):
-        self._order_by = (field, direction)
-        return self
+        if direction not in (self.ASCENDING, self.DESCENDING):
+            raise ValueError(f"Invalid order direction: {direction}")
+        query = self._copy()
+        query._order_by = (field, direction)
+        return query
     
     def limit(self, count: int):
-        self._limit_count = count
-        return self
+        query = self._copy()
+        query._limit_count = count
+        return query
     
-    def get(self):
-        # Return empty list for mock data
-        logger.info(f"Mock: Query {self.collection_name} with filters {self._filters}")
-        return []
-
-class MockCollection:
-    """Mock Firestore collection for development"""
-    def __init__(self, collection_name: str):
-        self.collection_name = collection_name
+    def start_after(self, document_fields_or_snapshot: Union['LocalDocument', Dict[str, Any]]):
+        """Resume after a document snapshot or a dict of order_by field values"""
+        if self._order_by is None:
+            raise ValueError("start_after requires order_by")
+        field = self._order_by[0]
+        if isinstance(document_fields_or_snapshot, LocalDocument):
+            position = (document_fields_or_snapshot.get(field), document_fields_or_snapshot.id)
+        else:
+            # Without a document id, skip every document sharing the field value
+            default_id = '' if self._order_by[1] == self.DESCENDING else '\U0010ffff'
+            position = (document_fields_or_snapshot[field], document_fields_or_snapshot.get(CURSOR_ID_FIELD, default_id))
+        query = self._copy()
+        query._start_after = position
+        return query
+    
+    def stream(self) -> Iterator[LocalDocument]:
+        """Yield matching documents one at a time"""
+        for doc_id, data in self._store.query(
+            self.collection_name, self._filters, self._order_by, self._limit_count, self._start_after
+        ):
+            reference = LocalDocumentReference(self._store, self.collection_name, doc_id)
+            yield LocalDocument(reference, data)
     
+    def get(self) -> List[LocalDocument]:
+        return list(self.stream())
+
+class LocalCollection(LocalQuery):
+    """Collection in the local store; an unfiltered query over its documents"""
     def document(self, doc_id: str = None):
         if doc_id is None:
             doc_id = str(uuid.uuid4())
-        return MockDocumentReference(self.collection_name, doc_id)
+        return LocalDocumentReference(self._store, self.collection_name, doc_id)
     
-    def where(self, field: str, op: str, value: Any):
-        return MockQuery(self.collection_name).where(field, op, value)
+    def create_if_absent(self, doc_id: str, data: Dict[str, Any], unique_fields: tuple, filters: list = (),
+                         interval: Optional[tuple] = None) -> bool:
+        """Atomically insert unless a document matching ``filters`` shares ``unique_fields``"""
+        return self._store.create_if_absent(self.collection_name, doc_id, data, unique_fields, filters, interval)
     
-    def order_by(self, field: str, direction: str = 'ASCENDING'):
-        return MockQuery(self.collection_name).order_by(field, direction)
+    def create_many_if_absent(self, documents: List[tuple], unique_fields: tuple, filters: list = (),
+                              interval: Optional[tuple] = None) -> List[bool]:
+        """create_if_absent for many (id, data) pairs, committed as one batch"""
+        return self._store.create_many_if_absent(self.collection_name, documents, unique_fields, filters, interval)
+
+class LocalWriteBatch:
+    """Group of writes committed to the local store in one log append"""
+    def __init__(self, store: LocalStore):
+        self._store = store
+        self._operations = []
     
-    def limit(self, count: int):
-        return MockQuery(self.collection_name).limit(count)
+    def set(self, reference: LocalDocumentReference, data: Dict[str, Any]):
+        self._operations.append(('set', reference.collection_name, reference.doc_id, data))
+        return self
     
-    def get(self):
-        logger.info(f"Mock: Get all documents from {self.collection_name}")
-        return []
+    def update(self, reference: LocalDocumentReference, data: Dict[str, Any]):
+        self._operations.append(('update', reference.collection_name, reference.doc_id, data))
+        return self
+    
+    def delete(self, reference: LocalDocumentReference):
+        self._operations.append(('delete', reference.collection_name, reference.doc_id, None))
+        return self
+    
+    def commit(self):
+        self._store.commit(self._operations)
+        self._operations = []
 
-class MockFirestore:
-    """Mock Firestore client for development"""
+class LocalFirestore:
+    """Firestore-compatible client backed by the embedded local store"""
+    def __init__(self, store: LocalStore):
+        self.store = store
+    
     def collection(self, collection_name: str):
-        return MockCollection(collection_name)
+        return LocalCollection(self.store, collection_name)
+    
+    def batch(self) -> LocalWriteBatch:
+        return LocalWriteBatch(self.store)
+    
+    def warmup(self):
+        """Nothing to connect; the store is loaded when it is created"""
+    
+    def create_index(self, collection_name: str, fields: tuple):
+        """Declare a hash index used to plan equality and `in` filters"""
+        self.store.create_index(collection_name, fields)
+    
+    def create_sorted_index(self, collection_name: str, field: str):
+        """Declare an ordered index used to stream order_by(...).limit(n)"""
+        self.store.create_sorted_index(collection_name, field)
+    
+    def close(self):
+        self.store.close()
 
 class FirebaseDB:
     _instance: Optional['FirebaseDB'] = None
@@ -110,15 +254,27 @@ class FirebaseDB:
         return cls._instance
     
     def _initialize(self):
-        """Initialize database - use mock for development"""
-        # For development, always use mock database
-        if os.getenv('ENVIRONMENT', 'development') == 'development':
-            logger.info("Using mock database for development")
-            self._db = MockFirestore()
-        else:
-            # For production, you would initialize real Firebase here
-            logger.warning("Production Firebase not configured, using mock")
-            self._db = MockFirestore()
+        """Initialize database - pick the backend configured in settings"""
+        backend = settings.DATABASE_BACKEND
+        if backend == 'firestore':
+            from firestore_backend import FirestoreClient
+            logger.info("Using Cloud Firestore for project %s", settings.FIREBASE_PROJECT_ID)
+            self._db = FirestoreClient(settings.FIREBASE_PROJECT_ID, settings.FIREBASE_CREDENTIALS_PATH)
+            return
+        if backend != 'local':
+            raise ValueError(f"Unknown DATABASE_BACKEND: {backend}")
+        
+        if settings.ENVIRONMENT != 'development':
+            logger.warning("Running outside development on the local database; set DATABASE_BACKEND=firestore")
+        logger.info("Using local database at %s", settings.LOCAL_DB_PATH or '<memory>')
+        store = LocalStore(settings.LOCAL_DB_PATH or None, fsync=settings.LOCAL_DB_FSYNC)
+        self._db = LocalFirestore(store)
+        for collection_name, indexes in LOCAL_INDEXES.items():
+            for fields in indexes:
+                self._db.create_index(collection_name, fields)
+        for collection_name, fields in LOCAL_SORTED_INDEXES.items():
+            for field in fields:
+                self._db.create_sorted_index(collection_name, field)
     
     @property
     def db(self):
@@ -130,6 +286,443 @@ class FirebaseDB:
     def get_collection(self, collection_name: str):
         """Get a collection reference"""
         return self.db.collection(collection_name)
+    
+    def batch(self):
+        """Start a write batch committed with a single round trip"""
+        return self.db.batch()
+    
+    def warmup(self):
+        """Establish the backend connection ahead of the first request"""
+        self.db.warmup()
+    
+    def close(self):
+        """Release the underlying database client"""
+        if self._db is not None:
+            self._db.close()
+
+class CollectionVersions:
+    """Per-collection write counters, bumped after every write through this module.
+
+    A version names the state of a collection as seen by readers, so a
+    response built from it can be revalidated without querying again.
+    Counters live in the shared state so all workers agree on them. The
+    epoch is drawn when the counters are first used and changes if they
+    are lost (a new process, or a flushed Redis), so a version is never
+    reused for different data.
+    """
+    EPOCH_KEY = 'version:epoch'
+
+    def __init__(self, state):
+        self._state = state
+        self.remote = state.remote
+
+    def bump(self, *collection_names: str):
+        for collection_name in set(collection_names):
+            self._state.incr(f'version:{collection_name}')
+
+    def current(self, collection_name: str) -> str:
+        """Opaque version string of a collection"""
+        epoch, version = self._state.get_ints([self.EPOCH_KEY, f'version:{collection_name}'])
+        if not epoch:
+            epoch = self._state.setdefault_int(self.EPOCH_KEY, random.getrandbits(48) | 1)
+        return f"{epoch:x}.{version}"
+
+class WriteQueueFull(Exception):
+    """Raised when the write-behind queue cannot accept more writes"""
+
+class WriteBehindQueue:
+    """Coalesces document sets into batched commits off the request path.
+
+    Every write is appended to a local spool before it is acknowledged and
+    the spool is replayed on start, so accepted writes survive a crash. A
+    background thread commits up to ``max_batch`` writes at a time, waiting
+    at most ``flush_interval`` seconds for a batch to fill. Enqueueing fails
+    with WriteQueueFull once ``max_pending`` writes are waiting.
+    
+    Each worker process locks its own spool file (``spool_path``, then
+    ``spool_path.1``, ...), so several workers can share a data directory.
+    """
+    def __init__(self, db: FirebaseDB, spool_path: str, max_batch: int = 500,
+                 flush_interval: float = 0.05, max_pending: int = 10000, fsync: bool = False,
+                 versions: Optional[CollectionVersions] = None):
+        self._db = db
+        self._versions = versions
+        self._spool_path = spool_path
+        self._max_batch = max_batch
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self.fsync = fsync
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._spool = None
+        self._spool_lock = None
+        self._seq = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Replay unacknowledged spooled writes and start the flusher"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            directory = os.path.dirname(self._spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            spool_path = self._claim_spool()
+            for record in self._recover(spool_path):
+                self._pending.append(record)
+                self._seq = max(self._seq, record['seq'])
+            self._rewrite_spool(spool_path)
+            self._spool = open(spool_path, 'a', encoding='utf-8')
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        if self._pending:
+            logger.info("Replaying %d spooled writes", len(self._pending))
+    
+    def stop(self):
+        """Flush pending writes and stop the flusher"""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            self._thread = None
+            self._spool.close()
+            self._spool = None
+            if self._spool_lock is not None:
+                self._spool_lock.close()
+                self._spool_lock = None
+    
+    def enqueue(self, collection_name: str, doc_id: str, data: Dict[str, Any]):
+        """Durably queue a document set; returns once it is spooled"""
+        with self._cond:
+            if self._spool is None:
+                raise RuntimeError("Write-behind queue is not running")
+            if len(self._pending) >= self._max_pending:
+                raise WriteQueueFull(f"{len(self._pending)} writes already pending")
+            self._seq += 1
+            record = {'seq': self._seq, 'c': collection_name, 'id': doc_id, 'd': data}
+            self._write_spool([record])
+            self._pending.append(record)
+            self._cond.notify()
+    
+    def _claim_spool(self) -> str:
+        """Lock the first spool file no other worker holds and return its path"""
+        if fcntl is None:
+            return self._spool_path
+        for index in itertools.count():
+            path = self._spool_path if index == 0 else f"{self._spool_path}.{index}"
+            lock = open(path + '.lock', 'w')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+            self._spool_lock = lock
+            return path
+    
+    def _recover(self, spool_path: str) -> List[Dict[str, Any]]:
+        if not os.path.exists(spool_path):
+            return []
+        records, acked = [], 0
+        with open(spool_path, 'rb') as spool:
+            for line in spool:
+                try:
+                    record = json.loads(line, object_hook=decode_object)
+                except ValueError:
+                    break
+                if 'ack' in record:
+                    acked = max(acked, record['ack'])
+                else:
+                    records.append(record)
+        return [record for record in records if record['seq'] > acked]
+    
+    def _rewrite_spool(self, spool_path: str):
+        """Replace the spool with one holding only the writes still pending.
+
+        The new spool is written and fsynced beside the old one and then
+        renamed over it, so a crash at any point leaves one complete copy of
+        every acknowledged write.
+        """
+        tmp_path = spool_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write(''.join(
+                json.dumps(record, default=encode_value, separators=(',', ':')) + '\n' for record in self._pending
+            ))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, spool_path)
+    
+    def _write_spool(self, records):
+        if not records:
+            return
+        self._spool.write(''.join(
+            json.dumps(record, default=encode_value, separators=(',', ':')) + '\n' for record in records
+        ))
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+    
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            deadline = time.monotonic() + self._flush_interval
+            while len(self._pending) < self._max_batch and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self._max_batch, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+    
+    def _commit(self, records: List[Dict[str, Any]]):
+        # Later sets of the same document replace earlier ones
+        latest = {}
+        for record in records:
+            latest[(record['c'], record['id'])] = record['d']
+        batch = self._db.batch()
+        for (collection_name, doc_id), data in latest.items():
+            batch.set(self._db.get_collection(collection_name).document(doc_id), data)
+        try:
+            with timed_db_operation('write_behind_commit'):
+                batch.commit()
+        finally:
+            if self._versions is not None:
+                self._versions.bump(*(collection_name for collection_name, _ in latest))
+    
+    def _run(self):
+        while True:
+            records = self._take_batch()
+            if not records:
+                return
+            delay = 0.1
+            while True:
+                try:
+                    self._commit(records)
+                    break
+                except Exception as e:
+                    logger.error("Write-behind commit of %d writes failed: %s", len(records), e)
+                    if self._stopping:
+                        # Still in the spool; replayed on next start
+                        return
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5.0)
+            with self._cond:
+                if self._pending:
+                    self._write_spool([{'ack': records[-1]['seq']}])
+                else:
+                    # Everything spooled is committed; start a fresh spool
+                    self._spool.seek(0)
+                    self._spool.truncate()
+
+def _timed_call(fn, args, kwargs):
+    with timed_db_operation(getattr(fn, '__name__', 'call')):
+        return fn(*args, **kwargs)
+
+def _versioned_call(versions: CollectionVersions, collection_name: str, fn, args, kwargs):
+    # Bumped even if the write failed part way; a spurious bump only costs a cache miss
+    try:
+        return _timed_call(fn, args, kwargs)
+    finally:
+        versions.bump(collection_name)
+
+class AsyncDocumentReference:
+    """Awaitable wrapper around a document reference"""
+    def __init__(self, db: 'AsyncFirebaseDB', reference):
+        self._db = db
+        self._reference = reference
+        self.id = reference.id
+    
+    async def get(self):
+        return await self._db.run(self._reference.get)
+    
+    async def set(self, data: Dict[str, Any], merge: bool = False):
+        await self._db.run_write(self._reference.collection_name, self._reference.set, data, merge=merge)
+        return self
+    
+    async def update(self, data: Dict[str, Any]):
+        await self._db.run_write(self._reference.collection_name, self._reference.update, data)
+        return self
+    
+    async def update_if_absent(self, data: Dict[str, Any], unique_fields: tuple, filters: list = (),
+                               interval: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
+        return await self._db.run_write(self._reference.collection_name, self._reference.update_if_absent,
+                                        data, unique_fields, filters, interval)
+    
+    async def delete(self):
+        await self._db.run_write(self._reference.collection_name, self._reference.delete)
+        return self
+
+class AsyncQuery:
+    """Awaitable wrapper around a query; building a query never blocks"""
+    def __init__(self, db: 'AsyncFirebaseDB', query):
+        self._db = db
+        self._query = query
+    
+    def where(self, field: str, op: str, value: Any):
+        return AsyncQuery(self._db, self._query.where(field, op, value))
+    
+    def order_by(self, field: str, direction: str = 'ASCENDING'):
+        return AsyncQuery(self._db, self._query.order_by(field, direction=direction))
+    
+    def limit(self, count: int):
+        return AsyncQuery(self._db, self._query.limit(count))
+    
+    def start_after(self, document_fields_or_snapshot):
+        return AsyncQuery(self._db, self._query.start_after(document_fields_or_snapshot))
+    
+    async def get(self) -> list:
+        return await self._db.run(self._query.get)
+    
+    async def iterate(self, field: str, page_size: int = 500) -> AsyncIterator[Any]:
+        """Yield every matching document, fetching one page at a time.
+
+        The query must be ordered by ``field``; pages resume with
+        start_after, so memory use stays at one page however many
+        documents match.
+        """
+        query = self
+        while True:
+            docs = await query.limit(page_size).get()
+            for doc in docs:
+                yield doc
+            if len(docs) < page_size:
+                return
+            last = docs[-1]
+            query = self.start_after({field: last.get(field), CURSOR_ID_FIELD: last.id})
+
+class AsyncCollection(AsyncQuery):
+    """Awaitable wrapper around a collection reference"""
+    def document(self, doc_id: str = None):
+        return AsyncDocumentReference(self._db, self._query.document(doc_id))
+    
+    async def create_if_absent(self, doc_id: str, data: Dict[str, Any], unique_fields: tuple, filters: list = (),
+                               interval: Optional[tuple] = None) -> bool:
+        return await self._db.run_write(self._query.collection_name, self._query.create_if_absent,
+                                        doc_id, data, unique_fields, filters, interval)
+    
+    async def create_many_if_absent(self, documents: List[tuple], unique_fields: tuple, filters: list = (),
+                                    interval: Optional[tuple] = None) -> List[bool]:
+        return await self._db.run_write(self._query.collection_name, self._query.create_many_if_absent,
+                                        documents, unique_fields, filters, interval)
+
+class AsyncFirebaseDB:
+    """Asyncio front end for FirebaseDB.
+
+    Blocking client calls run on a bounded thread pool so request handlers
+    can await them without stalling the event loop.
+    """
+    def __init__(self, sync_db: FirebaseDB, max_workers: int,
+                 write_behind: Optional[WriteBehindQueue] = None,
+                 versions: Optional[CollectionVersions] = None):
+        self._sync_db = sync_db
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.write_behind = write_behind
+        self.versions = versions or CollectionVersions(InProcessState())
+    
+    def _submit(self, call):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='db')
+        return asyncio.get_running_loop().run_in_executor(self._executor, call)
+    
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking database call on the pool, timed under the function's name"""
+        return await self._submit(functools.partial(_timed_call, fn, args, kwargs))
+    
+    async def run_write(self, collection_name: str, fn, *args, **kwargs):
+        """Like run(), then bump the version of the written collection"""
+        return await self._submit(functools.partial(_versioned_call, self.versions, collection_name, fn, args, kwargs))
+    
+    async def version(self, collection_name: str) -> str:
+        """Current version of a collection; changes after every write to it.
+
+        Read it before querying, so a concurrent write can only leave the
+        result tagged with an older version.
+        """
+        if self.versions.remote:
+            return await asyncio.to_thread(self.versions.current, collection_name)
+        return self.versions.current(collection_name)
+    
+    async def warmup(self):
+        """Connect the backend off the event loop"""
+        await self.run(self._sync_db.warmup)
+    
+    async def start(self):
+        """Warm up the backend and start the write-behind queue, if enabled"""
+        await self.warmup()
+        if self.write_behind is not None:
+            await self.run(self.write_behind.start)
+    
+    async def set_deferred(self, collection_name: str, doc_id: str, data: Dict[str, Any]):
+        """Set a document through the write-behind queue when it is enabled.
+
+        Returns once the write is durably spooled; it becomes visible to
+        reads after the next batch commit. Raises WriteQueueFull under
+        backpressure. Without a queue this is a plain awaited set.
+        """
+        if self.write_behind is None:
+            await self.get_collection(collection_name).document(doc_id).set(data)
+        elif self.write_behind.fsync:
+            # fsync can take milliseconds; keep it off the event loop
+            await self.run(self.write_behind.enqueue, collection_name, doc_id, data)
+        else:
+            self.write_behind.enqueue(collection_name, doc_id, data)
+    
+    async def set_many(self, collection_name: str, documents: List[tuple]):
+        """Write (id, data) pairs with one batch commit"""
+        def set_many():
+            collection = self._sync_db.get_collection(collection_name)
+            batch = self._sync_db.batch()
+            for doc_id, data in documents:
+                batch.set(collection.document(doc_id), data)
+            batch.commit()
+        await self.run_write(collection_name, set_many)
+    
+    async def update_many(self, collection_name: str, updates: List[tuple]):
+        """Apply (id, fields) updates with one batch commit"""
+        def update_many():
+            collection = self._sync_db.get_collection(collection_name)
+            batch = self._sync_db.batch()
+            for doc_id, data in updates:
+                batch.update(collection.document(doc_id), data)
+            batch.commit()
+        await self.run_write(collection_name, update_many)
+    
+    def get_collection(self, collection_name: str) -> AsyncCollection:
+        """Get an awaitable collection reference"""
+        return AsyncCollection(self, self._sync_db.get_collection(collection_name))
+    
+    def close(self):
+        """Flush queued writes, wait for in-flight calls, then release the client"""
+        if self.write_behind is not None:
+            self.write_behind.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._sync_db.close()
+
+# Global database instances
+firebase_db = FirebaseDB()
+
+# Counters and notifications shared with the other workers
+shared_state = create_shared_state(settings.SHARED_STATE_URL)
+collection_versions = CollectionVersions(shared_state)
 
-# Global database instance
-firebase_db = FirebaseDB()
\ No newline at end of file
+write_behind_queue = WriteBehindQueue(
+    firebase_db,
+    settings.WRITE_BEHIND_SPOOL_PATH,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_MS / 1000,
+    max_pending=settings.WRITE_BEHIND_MAX_PENDING,
+    fsync=settings.WRITE_BEHIND_FSYNC,
+    versions=collection_versions,
+) if settings.WRITE_BEHIND_ENABLED else None
+async_firebase_db = AsyncFirebaseDB(
+    firebase_db, max_workers=settings.DB_THREAD_POOL_SIZE, write_behind=write_behind_queue,
+    versions=collection_versions
+)
\ No newline at end of file
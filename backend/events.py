@@ -0,0 +1,113 @@
+"""
+In-process change feed pushed to admin clients as server-sent events
+"""
+import asyncio
+import collections
+import itertools
+import logging
+import uuid
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# Events kept for clients resuming with Last-Event-ID
+REPLAY_EVENTS = 1000
+
+# Events buffered per subscriber before it is told to refetch instead
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15.0
+
+# Sent when a client missed events and must reload its view
+RESET_EVENT = 'reset'
+
+Event = Tuple[int, str, bytes]
+
+
+class ChangeFeed:
+    """Fan-out of change events to subscriber queues on one event loop.
+
+    Every event gets an increasing id and is kept in a short replay
+    buffer, so a reconnecting client that sends Last-Event-ID only
+    receives what it missed. A client that falls too far behind gets a
+    ``reset`` event instead of an unbounded backlog.
+
+    Ids are ``<feed>:<n>``, where the feed part is random per process.
+    Each worker numbers events, including relayed ones, on its own. So an
+    id from another worker or an earlier run cannot be replayed and gets a
+    ``reset``.
+    """
+
+    def __init__(self, replay: int = REPLAY_EVENTS, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.feed_id = uuid.uuid4().hex[:12]
+        self._ids = itertools.count(1)
+        self._recent: Deque[Event] = collections.deque(maxlen=replay)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._queue_size = queue_size
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        """Record an event and hand it to every subscriber; call from the event loop"""
+        event = (next(self._ids), event_type, dumps(data))
+        self._recent.append(event)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Replace the backlog with a single reset
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((event[0], RESET_EVENT, b'{}'))
+
+    def _missed_since(self, last_event_id: Optional[str]):
+        """Events after ``last_event_id``, or None if they can no longer be replayed"""
+        if not last_event_id:
+            return []
+        feed_id, _, number = last_event_id.rpartition(':')
+        if feed_id != self.feed_id:
+            return None
+        try:
+            last = int(number)
+        except ValueError:
+            return None
+        if not self._recent:
+            return None
+        if last > self._recent[-1][0] or last < self._recent[0][0] - 1:
+            return None
+        return [event for event in self._recent if event[0] > last]
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Encoded server-sent events from now on, after any missed ones"""
+        queue: asyncio.Queue = asyncio.Queue(self._queue_size)
+        self._subscribers.add(queue)
+        # Taken together with subscribing, so no event is both replayed and queued
+        missed = self._missed_since(last_event_id)
+        try:
+            yield b'retry: 3000\n\n'
+            if missed is None:
+                # Unknown or expired id, e.g. after a restart: start over
+                yield self._encode((self._recent[-1][0] if self._recent else 0, RESET_EVENT, b'{}'))
+            else:
+                for event in missed:
+                    yield self._encode(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Also how a dropped connection is noticed
+                    yield b': keep-alive\n\n'
+                    continue
+                yield self._encode(event)
+        finally:
+            self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def _encode(self, event: Event) -> bytes:
+        event_id, event_type, data = event
+        return b'id: %s:%d\nevent: %s\ndata: %s\n\n' % (
+            self.feed_id.encode('ascii'), event_id, event_type.encode('ascii'), data)
@@ -0,0 +1,55 @@
+"""
+Streaming NDJSON and CSV encoders for admin exports
+"""
+import csv
+import io
+from datetime import datetime, date
+from typing import Any, AsyncIterator, Dict, List
+
+import orjson
+
+from responses import dumps
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows encoded per chunk handed to the response
+CHUNK_ROWS = 500
+
+# Leading characters that make spreadsheets read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Submitted text is untrusted; a leading quote keeps it plain text
+        return "'" + value
+    return '' if value is None else value
+
+
+async def stream_export(docs: AsyncIterator[Any], fields: List[str], export_format: str) -> AsyncIterator[Any]:
+    """Encode documents as NDJSON lines or CSV rows, a chunk at a time"""
+    buffer = io.StringIO() if export_format == 'csv' else io.BytesIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    if writer is not None:
+        writer.writerow(fields)
+
+    rows = 0
+    async for doc in docs:
+        data: Dict[str, Any] = doc.to_dict()
+        if writer is not None:
+            writer.writerow([_csv_value(data.get(field)) for field in fields])
+        else:
+            buffer.write(dumps({field: data.get(field) for field in fields}, option=orjson.OPT_APPEND_NEWLINE))
+        rows += 1
+        if rows % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
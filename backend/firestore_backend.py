@@ -0,0 +1,442 @@
+"""
+Production Cloud Firestore backend exposing the same interface as the local store
+"""
+import logging
+import os
+from typing import Optional, Dict, Any, List, Iterator
+
+from local_store import matches
+
+logger = logging.getLogger(__name__)
+
+
+# Documents reserved per transaction; each takes a document and a slot write,
+# and a transaction is limited to 500 writes
+RESERVE_CHUNK_SIZE = 250
+
+
+def _slot_id(data: Dict[str, Any], unique_fields: tuple) -> str:
+    return '|'.join(str(data.get(field)) for field in unique_fields).replace('/', '_')
+
+
+def _span(data: Dict[str, Any], interval: tuple) -> list:
+    start = data.get(interval[0])
+    end = data.get(interval[1])
+    return [start, start if end is None else end]
+
+
+def _overlapping(intervals: Dict[str, list], doc_id: str, span: list) -> List[str]:
+    """Holders in ``intervals`` other than ``doc_id`` whose span overlaps ``span``"""
+    start, end = span
+    return [holder_id for holder_id, (other_start, other_end) in intervals.items()
+            if holder_id != doc_id and other_start < end and start < other_end]
+
+
+class FirestoreDocumentReference:
+    """Wrapper around a Firestore document reference"""
+    def __init__(self, client: 'FirestoreClient', reference):
+        self._client = client
+        self._reference = reference
+        self.collection_name = reference.parent.id
+        self.doc_id = reference.id
+
+    @property
+    def id(self):
+        return self.doc_id
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._reference.set(data, merge=merge)
+        return self
+
+    def update(self, data: Dict[str, Any]):
+        self._reference.update(data)
+        return self
+
+    def update_if_absent(self, data: Dict[str, Any], unique_fields: tuple, filters: list = (),
+                         interval: Optional[tuple] = None) -> Optional[Dict[str, Any]]:
+        """Update unless the result conflicts on ``unique_fields``.
+
+        Returns the document as read inside the transaction, or None on
+        conflict; see FirestoreCollection.create_if_absent.
+        """
+        if interval is not None:
+            return self._client.reserve_interval(self._reference, data, unique_fields, filters, interval, create=False)
+        return self._client.reserve_slot(self._reference, data, unique_fields, filters, create=False)
+
+    def delete(self):
+        self._reference.delete()
+        return self
+
+    def get(self):
+        return self._reference.get()
+
+
+class FirestoreQuery:
+    """Wrapper around a Firestore query"""
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, client: 'FirestoreClient', collection, query, cursor: Optional[tuple] = None):
+        self._client = client
+        self._collection = collection
+        self._query = query
+        # (document id, field values) to start after, resolved when the query runs
+        self._cursor = cursor
+        self.collection_name = collection.id
+
+    def _wrap(self, query) -> 'FirestoreQuery':
+        return FirestoreQuery(self._client, self._collection, query, self._cursor)
+
+    def where(self, field: str, op: str, value: Any):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        return self._wrap(self._query.where(filter=FieldFilter(field, op, value)))
+
+    def order_by(self, field: str, direction: str = 'ASCENDING'):
+        return self._wrap(self._query.order_by(field, direction=direction))
+
+    def limit(self, count: int):
+        return self._wrap(self._query.limit(count))
+
+    def start_after(self, document_fields_or_snapshot):
+        """Resume after a snapshot or order_by field values.
+
+        When the values carry a document id, the snapshot is needed so
+        Firestore can break ties between documents with equal values. It is
+        fetched when the query runs, which happens on the database thread
+        pool, so building a query never blocks the event loop.
+        """
+        from database import CURSOR_ID_FIELD
+
+        if isinstance(document_fields_or_snapshot, dict) and CURSOR_ID_FIELD in document_fields_or_snapshot:
+            values = {k: v for k, v in document_fields_or_snapshot.items() if k != CURSOR_ID_FIELD}
+            cursor = (document_fields_or_snapshot[CURSOR_ID_FIELD], values)
+            return FirestoreQuery(self._client, self._collection, self._query, cursor)
+        return FirestoreQuery(self._client, self._collection, self._query.start_after(document_fields_or_snapshot))
+
+    def _resolved(self):
+        if self._cursor is None:
+            return self._query
+        doc_id, values = self._cursor
+        snapshot = self._collection.document(doc_id).get()
+        return self._query.start_after(snapshot if snapshot.exists else values)
+
+    def stream(self) -> Iterator[Any]:
+        return self._resolved().stream()
+
+    def get(self) -> List[Any]:
+        return list(self._resolved().stream())
+
+
+class FirestoreCollection(FirestoreQuery):
+    """Wrapper around a Firestore collection reference"""
+    def __init__(self, client: 'FirestoreClient', collection):
+        super().__init__(client, collection, collection)
+
+    def document(self, doc_id: str = None):
+        reference = self._collection.document(doc_id) if doc_id else self._collection.document()
+        return FirestoreDocumentReference(self._client, reference)
+
+    def create_if_absent(self, doc_id: str, data: Dict[str, Any], unique_fields: tuple, filters: list = (),
+                         interval: Optional[tuple] = None) -> bool:
+        """Atomically insert unless a document matching ``filters`` shares ``unique_fields``.
+
+        Each unique key has a slot document in ``<collection>__slots`` naming
+        its current holder. The slot and holder are read and written in one
+        transaction, so concurrent writers for the same key serialize on the
+        slot document only. With ``interval``, the key instead has a calendar
+        document in ``<collection>__calendars`` listing the [start, end) span
+        of each holder, and only overlapping spans conflict.
+        """
+        reference = self._collection.document(doc_id)
+        if interval is not None:
+            return self._client.reserve_interval(reference, data, unique_fields, filters, interval, create=True) is not None
+        return self._client.reserve_slot(reference, data, unique_fields, filters, create=True) is not None
+
+    def create_many_if_absent(self, documents: List[tuple], unique_fields: tuple, filters: list = (),
+                              interval: Optional[tuple] = None) -> List[bool]:
+        """create_if_absent for many (id, data) pairs, a transaction per chunk"""
+        created = []
+        for start in range(0, len(documents), RESERVE_CHUNK_SIZE):
+            chunk = documents[start:start + RESERVE_CHUNK_SIZE]
+            if interval is not None:
+                created.extend(self._client.reserve_intervals(self._collection, chunk, unique_fields, filters, interval))
+            else:
+                created.extend(self._client.reserve_slots(self._collection, chunk, unique_fields, filters))
+        return created
+
+
+class FirestoreWriteBatch:
+    """Wrapper around a Firestore write batch (at most 500 operations)"""
+    def __init__(self, batch):
+        self._batch = batch
+
+    def set(self, reference: FirestoreDocumentReference, data: Dict[str, Any]):
+        self._batch.set(reference._reference, data)
+        return self
+
+    def update(self, reference: FirestoreDocumentReference, data: Dict[str, Any]):
+        self._batch.update(reference._reference, data)
+        return self
+
+    def delete(self, reference: FirestoreDocumentReference):
+        self._batch.delete(reference._reference)
+        return self
+
+    def commit(self):
+        self._batch.commit()
+
+
+class FirestoreClient:
+    """Long-lived Cloud Firestore client shared by every request.
+
+    Honors FIRESTORE_EMULATOR_HOST, in which case no credentials are needed.
+    """
+    def __init__(self, project_id: Optional[str], credentials_path: Optional[str]):
+        from google.cloud import firestore
+
+        self._firestore = firestore
+        if os.getenv('FIRESTORE_EMULATOR_HOST'):
+            logger.info("Using Firestore emulator at %s", os.getenv('FIRESTORE_EMULATOR_HOST'))
+            self.client = firestore.Client(project=project_id or 'demo-lead-g')
+        else:
+            import firebase_admin
+            from firebase_admin import credentials, firestore as admin_firestore
+
+            if credentials_path and os.path.exists(credentials_path):
+                credential = credentials.Certificate(credentials_path)
+            else:
+                logger.warning("Firebase credentials not found at %s, using application default credentials", credentials_path)
+                credential = credentials.ApplicationDefault()
+            options = {'projectId': project_id} if project_id else None
+            try:
+                app = firebase_admin.get_app()
+            except ValueError:
+                app = firebase_admin.initialize_app(credential, options)
+            self.client = admin_firestore.client(app)
+
+    def collection(self, collection_name: str):
+        return FirestoreCollection(self, self.client.collection(collection_name))
+
+    def batch(self) -> FirestoreWriteBatch:
+        return FirestoreWriteBatch(self.client.batch())
+
+    def warmup(self):
+        """Open the gRPC channel and authenticate before the first request"""
+        list(self.client.collection('health_check').limit(1).stream())
+
+    def reserve_slot(self, reference, data: Dict[str, Any], unique_fields: tuple,
+                     filters: list, create: bool) -> Optional[Dict[str, Any]]:
+        """Create or update ``reference`` while holding its unique slot.
+
+        Returns the previous document data ({} when creating), or None when
+        the slot is held by another matching document.
+        """
+        firestore = self._firestore
+        transaction = self.client.transaction()
+        slots = self.client.collection(f'{reference.parent.id}__slots')
+
+        @firestore.transactional
+        def reserve(transaction) -> Optional[Dict[str, Any]]:
+            previous = {}
+            if create:
+                merged = dict(data)
+            else:
+                current = next(iter(transaction.get(reference)), None)
+                if current is None or not current.exists:
+                    raise KeyError(f"No document to update: {reference.path}")
+                previous = current.to_dict()
+                merged = {**previous, **data}
+
+            slot_ref = slots.document(_slot_id(merged, unique_fields))
+            slot = next(iter(transaction.get(slot_ref)), None)
+            holder_id = slot.to_dict().get('holder') if slot is not None and slot.exists else None
+            takes_slot = matches(merged, list(filters))
+
+            if takes_slot and holder_id and holder_id != reference.id:
+                holder = next(iter(transaction.get(reference.parent.document(holder_id))), None)
+                if holder is not None and holder.exists and matches(holder.to_dict(), list(filters)):
+                    return None
+
+            if create:
+                transaction.create(reference, data)
+            else:
+                transaction.update(reference, data)
+            if takes_slot:
+                transaction.set(slot_ref, {'holder': reference.id})
+            return previous
+
+        return reserve(transaction)
+
+    def reserve_slots(self, collection, documents: List[tuple], unique_fields: tuple,
+                      filters: list) -> List[bool]:
+        """Create (id, data) documents in one transaction, skipping taken slots.
+
+        All slot documents, then all of their holders, are read with one
+        get_all each. Documents also conflict with earlier ones in the
+        same call. Returns one flag per document, True if created.
+        """
+        firestore = self._firestore
+        transaction = self.client.transaction()
+        slots = self.client.collection(f'{collection.id}__slots')
+
+        @firestore.transactional
+        def reserve(transaction) -> List[bool]:
+            slot_ids = [_slot_id(data, unique_fields) for _, data in documents]
+            slot_refs = {slot_id: slots.document(slot_id) for slot_id in set(slot_ids)}
+            holder_ids = {}
+            for slot in transaction.get_all(list(slot_refs.values())):
+                if slot.exists and slot.to_dict().get('holder'):
+                    holder_ids[slot.id] = slot.to_dict()['holder']
+
+            active_holders = set()
+            if holder_ids:
+                holder_refs = [collection.document(holder_id) for holder_id in set(holder_ids.values())]
+                for holder in transaction.get_all(holder_refs):
+                    if holder.exists and matches(holder.to_dict(), list(filters)):
+                        active_holders.add(holder.id)
+
+            taken = {slot_id for slot_id, holder_id in holder_ids.items() if holder_id in active_holders}
+            created = []
+            for (doc_id, data), slot_id in zip(documents, slot_ids):
+                takes_slot = matches(data, list(filters))
+                if takes_slot and slot_id in taken:
+                    created.append(False)
+                    continue
+                transaction.create(collection.document(doc_id), data)
+                if takes_slot:
+                    taken.add(slot_id)
+                    transaction.set(slot_refs[slot_id], {'holder': doc_id})
+                created.append(True)
+            return created
+
+        return reserve(transaction)
+
+    def _calendars(self, transaction, collection, keyed: Dict[str, Dict[str, Any]], unique_fields: tuple,
+                   filters: list, interval: tuple) -> Dict[str, Dict[str, list]]:
+        """Read the calendar documents for {calendar id: sample document data}.
+
+        A calendar that does not exist yet is seeded from a query for the
+        documents it covers, so documents written before it still count.
+        """
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        calendars_collection = self.client.collection(f'{collection.id}__calendars')
+        calendars = {}
+        for snapshot in transaction.get_all([calendars_collection.document(calendar_id) for calendar_id in keyed]):
+            if snapshot.exists:
+                calendars[snapshot.id] = dict(snapshot.to_dict().get('intervals', {}))
+        for calendar_id, data in keyed.items():
+            if calendar_id in calendars:
+                continue
+            query = collection
+            for field in unique_fields:
+                query = query.where(filter=FieldFilter(field, '==', data.get(field)))
+            for field, op, value in filters:
+                query = query.where(filter=FieldFilter(field, op, value))
+            calendars[calendar_id] = {doc.id: _span(doc.to_dict(), interval) for doc in transaction.get(query)}
+        return calendars
+
+    def _live_holders(self, transaction, collection, holder_ids, filters: list) -> set:
+        """Which of ``holder_ids`` still exist and match ``filters``"""
+        if not holder_ids:
+            return set()
+        holders = transaction.get_all([collection.document(holder_id) for holder_id in set(holder_ids)])
+        return {holder.id for holder in holders if holder.exists and matches(holder.to_dict(), list(filters))}
+
+    def reserve_interval(self, reference, data: Dict[str, Any], unique_fields: tuple, filters: list,
+                         interval: tuple, create: bool) -> Optional[Dict[str, Any]]:
+        """Create or update ``reference`` unless its span overlaps another holder's.
+
+        Returns the previous document data ({} when creating), or None on
+        conflict. Holders that are no longer active are dropped from the
+        calendar when they are found overlapping.
+        """
+        firestore = self._firestore
+        transaction = self.client.transaction()
+        collection = reference.parent
+        calendars_collection = self.client.collection(f'{collection.id}__calendars')
+
+        @firestore.transactional
+        def reserve(transaction) -> Optional[Dict[str, Any]]:
+            previous = {}
+            if create:
+                merged = dict(data)
+            else:
+                current = next(iter(transaction.get(reference)), None)
+                if current is None or not current.exists:
+                    raise KeyError(f"No document to update: {reference.path}")
+                previous = current.to_dict()
+                merged = {**previous, **data}
+
+            calendar_id = _slot_id(merged, unique_fields)
+            intervals = self._calendars(transaction, collection, {calendar_id: merged},
+                                        unique_fields, filters, interval)[calendar_id]
+            span = _span(merged, interval)
+            takes_slot = matches(merged, list(filters))
+
+            if takes_slot:
+                overlapping = _overlapping(intervals, reference.id, span)
+                if self._live_holders(transaction, collection, overlapping, filters):
+                    return None
+                for holder_id in overlapping:
+                    del intervals[holder_id]
+                intervals[reference.id] = span
+            else:
+                intervals.pop(reference.id, None)
+
+            if create:
+                transaction.create(reference, data)
+            else:
+                transaction.update(reference, data)
+            transaction.set(calendars_collection.document(calendar_id), {'intervals': intervals})
+            return previous
+
+        return reserve(transaction)
+
+    def reserve_intervals(self, collection, documents: List[tuple], unique_fields: tuple,
+                          filters: list, interval: tuple) -> List[bool]:
+        """Create (id, data) documents in one transaction, skipping overlapping spans.
+
+        Calendars and the holders of overlapping spans are each read with
+        one get_all. Documents also conflict with earlier ones in the same
+        call. Returns one flag per document, True if created.
+        """
+        firestore = self._firestore
+        transaction = self.client.transaction()
+        calendars_collection = self.client.collection(f'{collection.id}__calendars')
+
+        @firestore.transactional
+        def reserve(transaction) -> List[bool]:
+            calendar_ids = [_slot_id(data, unique_fields) for _, data in documents]
+            keyed = {calendar_id: data for calendar_id, (_, data) in zip(calendar_ids, documents)}
+            calendars = self._calendars(transaction, collection, keyed, unique_fields, filters, interval)
+
+            overlapping = set()
+            for (doc_id, data), calendar_id in zip(documents, calendar_ids):
+                overlapping.update(_overlapping(calendars[calendar_id], doc_id, _span(data, interval)))
+            live = self._live_holders(transaction, collection, overlapping, filters)
+            for intervals in calendars.values():
+                for holder_id in overlapping - live:
+                    intervals.pop(holder_id, None)
+
+            created = []
+            changed = set()
+            for (doc_id, data), calendar_id in zip(documents, calendar_ids):
+                takes_slot = matches(data, list(filters))
+                span = _span(data, interval)
+                if takes_slot and _overlapping(calendars[calendar_id], doc_id, span):
+                    created.append(False)
+                    continue
+                transaction.create(collection.document(doc_id), data)
+                if takes_slot:
+                    calendars[calendar_id][doc_id] = span
+                    changed.add(calendar_id)
+                created.append(True)
+            for calendar_id in changed:
+                transaction.set(calendars_collection.document(calendar_id), {'intervals': calendars[calendar_id]})
+            return created
+
+        return reserve(transaction)
+
+    def close(self):
+        self.client.close()
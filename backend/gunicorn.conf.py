@@ -0,0 +1,14 @@
+"""
+Gunicorn settings for running the API with several uvicorn workers
+
+    gunicorn server:app -c gunicorn.conf.py
+"""
+from config import settings
+from shared_state import effective_worker_count
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = effective_worker_count(settings)
+worker_class = "uvicorn.workers.UvicornWorker"
+# Each worker loads the app itself, so none inherits another's threads or sockets
+preload_app = False
+graceful_timeout = 30
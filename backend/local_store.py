@@ -0,0 +1,692 @@
+"""
+Embedded document store used as the local Firestore backend
+"""
+import bisect
+import contextlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+from datetime import datetime, date
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Iterable, Callable
+
+logger = logging.getLogger(__name__)
+
+Filter = Tuple[str, str, Any]
+
+_DATETIME_TAG = '__datetime__'
+_DATE_TAG = '__date__'
+_MISSING = object()
+
+
+def encode_value(value: Any):
+    """JSON encoder hook that tags datetime values so they survive a round trip"""
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    if isinstance(value, date):
+        return {_DATE_TAG: value.isoformat()}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not storable")
+
+
+def decode_object(obj: Dict[str, Any]):
+    """JSON object hook that restores tagged datetime values"""
+    if len(obj) == 1:
+        if _DATETIME_TAG in obj:
+            return datetime.fromisoformat(obj[_DATETIME_TAG])
+        if _DATE_TAG in obj:
+            return date.fromisoformat(obj[_DATE_TAG])
+    return obj
+
+
+def sort_key(value: Any) -> Tuple:
+    """Total ordering across value types, following Firestore's type order"""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value)
+    if isinstance(value, date):
+        return (3, datetime(value.year, value.month, value.day))
+    if isinstance(value, str):
+        return (4, value)
+    return (5, str(value))
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    left_key, right_key = sort_key(left), sort_key(right)
+    # Range comparisons only match values of the same type, as in Firestore
+    if left_key[0] != right_key[0]:
+        return False
+    if op == '<':
+        return left_key < right_key
+    if op == '<=':
+        return left_key <= right_key
+    if op == '>':
+        return left_key > right_key
+    return left_key >= right_key
+
+
+def matches(data: Dict[str, Any], filters: List[Filter]) -> bool:
+    """Check a document against a list of (field, op, value) filters"""
+    for field, op, value in filters:
+        if field not in data:
+            return False
+        current = data[field]
+        if op == '==':
+            ok = current == value
+        elif op == '!=':
+            ok = current != value
+        elif op == 'in':
+            ok = current in value
+        elif op == 'not-in':
+            ok = current not in value
+        elif op == 'array-contains':
+            ok = isinstance(current, list) and value in current
+        elif op == 'array-contains-any':
+            ok = isinstance(current, list) and any(v in current for v in value)
+        elif op in ('<', '<=', '>', '>='):
+            ok = _compare(op, current, value)
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def _taken(spans: Optional[List[Tuple[Any, Any]]], span: Optional[Tuple[Any, Any]]) -> bool:
+    """Whether ``span`` collides with spans already claimed under the same key"""
+    if not spans:
+        return False
+    if span is None:
+        return True
+    start, end = span
+    return any(other_start < end and start < other_end for other_start, other_end in spans)
+
+
+def _hashable(value: Any):
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+class CorruptLogError(Exception):
+    """Raised when a record in the middle of the log cannot be replayed"""
+
+
+class HashIndex:
+    """Hash index mapping a tuple of field values to the ids holding them"""
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = tuple(fields)
+        self._entries: Dict[Tuple, set] = {}
+
+    def _key(self, data: Optional[Dict[str, Any]]) -> Optional[Tuple]:
+        if data is None or any(field not in data for field in self.fields):
+            return None
+        return tuple(_hashable(data[field]) for field in self.fields)
+
+    def add(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        key = self._key(data)
+        if key is not None:
+            self._entries.setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        key = self._key(data)
+        if key is None:
+            return
+        ids = self._entries.get(key)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del self._entries[key]
+
+    def buckets(self, keys) -> List[set]:
+        """Return the id sets stored under the given keys"""
+        buckets = []
+        for key in keys:
+            ids = self._entries.get(tuple(_hashable(v) for v in key))
+            if ids:
+                buckets.append(ids)
+        return buckets
+
+
+class SortedIndex:
+    """Ordered index over one field, kept as a sorted array of (key, id).
+
+    Listing timestamps only grow, so new entries land at the tail and
+    inserts stay cheap; reads walk the array from either end.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._entries: List[Tuple[Tuple, str]] = []
+
+    def add(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        if data is not None and self.field in data:
+            bisect.insort(self._entries, (sort_key(data[self.field]), doc_id))
+
+    def remove(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        if data is None or self.field not in data:
+            return
+        entry = (sort_key(data[self.field]), doc_id)
+        position = bisect.bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def walk(self, descending: bool = False, after: Optional[Tuple] = None) -> Iterator[str]:
+        """Yield document ids in index order, optionally resuming after a key"""
+        if descending:
+            end = len(self._entries) if after is None else bisect.bisect_left(self._entries, after)
+            for position in range(end - 1, -1, -1):
+                yield self._entries[position][1]
+        else:
+            start = 0 if after is None else bisect.bisect_right(self._entries, after)
+            for position in range(start, len(self._entries)):
+                yield self._entries[position][1]
+
+
+def _plan_hash_lookup(indexes: List[HashIndex], filters: List[Filter]):
+    """Pick the hash index that covers the most equality/`in` filters.
+
+    Returns the index and the value combinations to probe, or (None, None)
+    when no index applies and the collection has to be scanned.
+    """
+    candidates: Dict[str, List[Any]] = {}
+    for field, op, value in filters:
+        if op == '==':
+            values = [value]
+        elif op == 'in':
+            values = list(value)
+        else:
+            continue
+        if field in candidates:
+            # Several constraints on one field: keep only values satisfying all
+            values = [v for v in candidates[field] if v in values]
+        candidates[field] = values
+
+    best, best_keys = None, None
+    for index in indexes:
+        if not all(field in candidates for field in index.fields):
+            continue
+        key_count = 1
+        for field in index.fields:
+            key_count *= len(candidates[field])
+        if best is None or (len(index.fields), -key_count) > (len(best.fields), -best_keys):
+            best, best_keys = index, key_count
+
+    if best is None:
+        return None, None
+    return best, itertools.product(*(candidates[field] for field in best.fields))
+
+
+class StripedLock:
+    """Fixed pool of locks; keys hash onto a stripe so unrelated keys rarely contend"""
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def lock_for(self, key: Tuple) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    @contextlib.contextmanager
+    def locks_for(self, keys: Iterable[Tuple]):
+        """Hold the stripes of several keys at once, taken in a fixed order"""
+        stripes = sorted({hash(key) % len(self._locks) for key in keys})
+        with contextlib.ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._locks[stripe])
+            yield
+
+
+class LocalStore:
+    """In-process document store with append-only log persistence.
+
+    Documents live in per-collection dicts keyed by id. Every mutation is
+    applied in memory under the store lock and queued for a JSON-lines log,
+    which is written after that lock is released; a write returns once its
+    record is on disk. Concurrent writers share one flush (and fsync). The
+    log is replayed on startup. A torn final record left by a crash is
+    discarded. If a log write fails the store refuses further writes.
+    """
+
+    def __init__(self, path: Optional[str] = None, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._hash_indexes: Dict[str, List[HashIndex]] = {}
+        self._sorted_indexes: Dict[str, Dict[str, SortedIndex]] = {}
+        self._lock = threading.RLock()
+        self._slot_locks = StripedLock()
+        self._log = None
+        # Records applied in memory but not yet written. Lock order is
+        # _log_lock, then _lock; disk I/O holds only _log_lock
+        self._log_lock = threading.Lock()
+        self._log_pending: List[str] = []
+        self._log_queued = 0
+        self._log_written = 0
+        self._log_error: Optional[BaseException] = None
+
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            records = self._recover()
+            self._log = open(self.path, 'a', encoding='utf-8')
+            live = sum(len(docs) for docs in self._collections.values())
+            if records > 2 * live + 1000:
+                self.compact()
+
+    # Persistence
+
+    def _recover(self) -> int:
+        """Replay the log into memory and return the number of records read.
+
+        A bad final record, or one missing its newline, is a write torn by
+        a crash and is cut off. A bad record followed by others means the
+        log itself is damaged; the file is left untouched and
+        CorruptLogError is raised.
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        records = 0
+        valid_bytes = 0
+        with open(self.path, 'rb') as log:
+            for line in log:
+                if not line.endswith(b'\n'):
+                    # Appending after it would join the next record onto this line
+                    logger.warning("Discarding unterminated log tail in %s at byte %d", self.path, valid_bytes)
+                    break
+                try:
+                    record = json.loads(line, object_hook=decode_object)
+                    self._apply(record['op'], record['c'], record['id'], record.get('d'))
+                except (ValueError, KeyError, TypeError) as e:
+                    if log.read(1):
+                        raise CorruptLogError(
+                            f"Unreadable record {records + 1} at byte {valid_bytes} of {self.path}, "
+                            f"followed by further records: {e}"
+                        ) from e
+                    logger.warning("Discarding torn log tail in %s at byte %d: %s", self.path, valid_bytes, e)
+                    break
+                records += 1
+                valid_bytes += len(line)
+
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as log:
+                log.truncate(valid_bytes)
+
+        logger.info("Recovered %d log records from %s", records, self.path)
+        return records
+
+    def _queue_log(self, operations: List[Tuple[str, str, str, Optional[Dict[str, Any]]]]) -> int:
+        """Queue log records and return the ticket to pass to _write_log.
+
+        Must be called with the store lock held, right before the
+        operations are applied.
+        """
+        if not self.path:
+            return 0
+        if self._log_error is not None:
+            raise OSError(f"Local store log {self.path} failed to write; restart to recover") from self._log_error
+        for op, collection, doc_id, data in operations:
+            record = {'op': op, 'c': collection, 'id': doc_id}
+            if data is not None:
+                record['d'] = data
+            self._log_pending.append(json.dumps(record, default=encode_value, separators=(',', ':')) + '\n')
+        self._log_queued += 1
+        return self._log_queued
+
+    def _write_log(self, ticket: int):
+        """Write queued records up to ``ticket`` with a single flush (and fsync).
+
+        Called without the store lock. Whoever holds the log lock writes
+        every record queued so far, so writers arriving meanwhile usually
+        find their records already on disk.
+        """
+        if not ticket:
+            return
+        with self._log_lock:
+            if self._log_error is not None:
+                raise OSError(f"Local store log {self.path} failed to write; restart to recover") from self._log_error
+            if self._log_written >= ticket:
+                return
+            with self._lock:
+                lines, self._log_pending = self._log_pending, []
+                upto = self._log_queued
+            try:
+                if self._log is None:
+                    # Reopened lazily so writes after close() are still persisted
+                    self._log = open(self.path, 'a', encoding='utf-8')
+                self._log.write(''.join(lines))
+                self._log.flush()
+                if self.fsync:
+                    os.fsync(self._log.fileno())
+            except Exception as e:
+                # Memory is now ahead of the log; stop accepting writes
+                self._log_error = e
+                raise
+            self._log_written = upto
+
+    def compact(self):
+        """Rewrite the log so it holds exactly one record per live document"""
+        if not self.path:
+            return
+        with self._log_lock, self._lock:
+            tmp_path = self.path + '.compact'
+            with open(tmp_path, 'w', encoding='utf-8') as out:
+                for collection, docs in self._collections.items():
+                    for doc_id, data in docs.items():
+                        record = {'op': 'set', 'c': collection, 'id': doc_id, 'd': data}
+                        out.write(json.dumps(record, default=encode_value, separators=(',', ':')) + '\n')
+                out.flush()
+                os.fsync(out.fileno())
+            if self._log is not None:
+                self._log.close()
+            os.replace(tmp_path, self.path)
+            self._log = open(self.path, 'a', encoding='utf-8')
+            # The rewrite already holds every queued record
+            self._log_pending = []
+            self._log_written = self._log_queued
+            logger.info("Compacted local store log %s", self.path)
+
+    def close(self):
+        with self._log_lock, self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    # Indexes
+
+    def create_index(self, collection: str, fields: Tuple[str, ...]):
+        """Declare a hash index over one or more fields of a collection"""
+        with self._lock:
+            indexes = self._hash_indexes.setdefault(collection, [])
+            if any(index.fields == tuple(fields) for index in indexes):
+                return
+            index = HashIndex(fields)
+            for doc_id, data in self._collections.get(collection, {}).items():
+                index.add(doc_id, data)
+            indexes.append(index)
+
+    def create_sorted_index(self, collection: str, field: str):
+        """Declare an ordered index used by order_by(...).limit(n) queries"""
+        with self._lock:
+            indexes = self._sorted_indexes.setdefault(collection, {})
+            if field in indexes:
+                return
+            index = SortedIndex(field)
+            index._entries = sorted(
+                (sort_key(data[field]), doc_id)
+                for doc_id, data in self._collections.get(collection, {}).items()
+                if field in data
+            )
+            indexes[field] = index
+
+    # Mutations
+
+    def _apply(self, op: str, collection: str, doc_id: str, data: Optional[Dict[str, Any]]):
+        docs = self._collections.setdefault(collection, {})
+        old = docs.get(doc_id)
+        if op == 'set':
+            new = data
+        elif op == 'update':
+            new = {**old, **data}
+        elif op == 'delete':
+            new = None
+        else:
+            raise ValueError(f"Unknown log operation: {op}")
+
+        if new is None:
+            docs.pop(doc_id, None)
+        else:
+            docs[doc_id] = new
+
+        for index in self._hash_indexes.get(collection, ()):
+            index.remove(doc_id, old)
+            index.add(doc_id, new)
+        for field, index in self._sorted_indexes.get(collection, {}).items():
+            if old is not None and new is not None and old.get(field, _MISSING) == new.get(field, _MISSING):
+                continue
+            index.remove(doc_id, old)
+            index.add(doc_id, new)
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        data = dict(data)
+        with self._lock:
+            op = 'update' if merge and doc_id in self._collections.get(collection, {}) else 'set'
+            ticket = self._queue_log([(op, collection, doc_id, data)])
+            self._apply(op, collection, doc_id, data)
+        self._write_log(ticket)
+
+    def update(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        data = dict(data)
+        with self._lock:
+            if doc_id not in self._collections.get(collection, {}):
+                raise KeyError(f"No document to update: {collection}/{doc_id}")
+            ticket = self._queue_log([('update', collection, doc_id, data)])
+            self._apply('update', collection, doc_id, data)
+        self._write_log(ticket)
+
+    def delete(self, collection: str, doc_id: str):
+        with self._lock:
+            if doc_id not in self._collections.get(collection, {}):
+                return
+            ticket = self._queue_log([('delete', collection, doc_id, None)])
+            self._apply('delete', collection, doc_id, None)
+        self._write_log(ticket)
+
+    def commit(self, operations: List[Tuple[str, str, str, Optional[Dict[str, Any]]]]):
+        """Apply a batch of (op, collection, id, data) writes all-or-nothing.
+
+        The batch is validated first and then logged with one flush, so a
+        large batch costs a single disk round trip.
+        """
+        with self._lock:
+            exists = {}
+            prepared = []
+            for op, collection, doc_id, data in operations:
+                key = (collection, doc_id)
+                present = exists.get(key, doc_id in self._collections.get(collection, {}))
+                if op == 'update' and not present:
+                    raise KeyError(f"No document to update: {collection}/{doc_id}")
+                if op not in ('set', 'update', 'delete'):
+                    raise ValueError(f"Unknown batch operation: {op}")
+                exists[key] = op != 'delete'
+                prepared.append((op, collection, doc_id, dict(data) if data is not None else None))
+
+            ticket = self._queue_log(prepared) if prepared else 0
+            for op, collection, doc_id, data in prepared:
+                self._apply(op, collection, doc_id, data)
+        self._write_log(ticket)
+
+    # Conditional writes
+
+    def create_if_absent(self, collection: str, doc_id: str, data: Dict[str, Any],
+                         unique_fields: Tuple[str, ...], filters: List[Filter] = (),
+                         interval: Optional[Tuple[str, str]] = None) -> bool:
+        """Insert a document unless another one shares its unique key.
+
+        Only existing documents that also match ``filters`` count as
+        conflicts. With ``interval`` naming (start, end) fields, documents
+        sharing the key only conflict when their [start, end) ranges
+        overlap. The check and the write run under a lock striped on the
+        unique key, so writers on different keys never wait on each other.
+        Returns False when a conflicting document exists.
+        """
+        key = tuple(_hashable(data.get(field)) for field in unique_fields)
+        with self._slot_locks.lock_for((collection,) + key):
+            if self._has_conflict(collection, doc_id, data, unique_fields, filters, interval):
+                return False
+            self.set(collection, doc_id, data)
+            return True
+
+    def create_many_if_absent(self, collection: str, documents: List[Tuple[str, Dict[str, Any]]],
+                              unique_fields: Tuple[str, ...], filters: List[Filter] = (),
+                              interval: Optional[Tuple[str, str]] = None) -> List[bool]:
+        """Insert each (id, data) document unless its unique key is already taken.
+
+        Like create_if_absent for a whole batch: documents conflict with
+        stored ones and with earlier documents of the same batch. Every
+        involved lock stripe is held while the accepted documents are
+        committed together. Returns one flag per document, True if inserted.
+        """
+        keys = [tuple(_hashable(data.get(field)) for field in unique_fields) for _, data in documents]
+        with self._slot_locks.locks_for((collection,) + key for key in keys):
+            taken: Dict[Tuple, List[Tuple[Any, Any]]] = {}
+            created = []
+            operations = []
+            for (doc_id, data), key in zip(documents, keys):
+                holds_slot = matches(data, list(filters))
+                span = (data.get(interval[0]), data.get(interval[1])) if interval else None
+                if holds_slot and (_taken(taken.get(key), span) or
+                                   self._has_conflict(collection, doc_id, data, unique_fields, filters, interval)):
+                    created.append(False)
+                    continue
+                if holds_slot:
+                    taken.setdefault(key, []).append(span)
+                operations.append(('set', collection, doc_id, data))
+                created.append(True)
+            self.commit(operations)
+            return created
+
+    def update_if_absent(self, collection: str, doc_id: str, data: Dict[str, Any],
+                         unique_fields: Tuple[str, ...], filters: List[Filter] = (),
+                         interval: Optional[Tuple[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """Update a document unless the result would conflict on its unique key.
+
+        The updated document is only checked when it matches ``filters``
+        itself (e.g. an appointment being reactivated). Returns the document
+        as it was right before the update, or None on conflict. Raises
+        KeyError if the document does not exist.
+        """
+        while True:
+            current = self.get(collection, doc_id)
+            if current is None:
+                raise KeyError(f"No document to update: {collection}/{doc_id}")
+            merged = {**current, **data}
+            key = tuple(_hashable(merged.get(field)) for field in unique_fields)
+            with self._slot_locks.lock_for((collection,) + key):
+                # Re-read under the lock so the returned state is exact
+                latest = self.get(collection, doc_id)
+                if latest != current:
+                    continue
+                if matches(merged, list(filters)) and \
+                        self._has_conflict(collection, doc_id, merged, unique_fields, filters, interval):
+                    return None
+                self.update(collection, doc_id, data)
+                return current
+
+    def _has_conflict(self, collection: str, doc_id: str, data: Dict[str, Any],
+                      unique_fields: Tuple[str, ...], filters: List[Filter],
+                      interval: Optional[Tuple[str, str]] = None) -> bool:
+        conflict_filters = [(field, '==', data.get(field)) for field in unique_fields] + list(filters)
+        if interval is not None:
+            start_field, end_field = interval
+            conflict_filters += [(start_field, '<', data.get(end_field)), (end_field, '>', data.get(start_field))]
+        for other_id, _ in self.query(collection, conflict_filters):
+            if other_id != doc_id:
+                return True
+        return False
+
+    # Reads
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        data = self._collections.get(collection, {}).get(doc_id)
+        return dict(data) if data is not None else None
+
+    def count(self, collection: str) -> int:
+        return len(self._collections.get(collection, {}))
+
+    def query(self, collection: str, filters: List[Filter],
+              order_by: Optional[Tuple[str, str]] = None,
+              limit: Optional[int] = None,
+              start_after: Optional[Tuple[Any, str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (id, data) pairs matching the filters in the requested order.
+
+        ``start_after`` is an (order value, document id) pair; results resume
+        strictly after that position in the ``order_by`` ordering.
+        """
+        if start_after is not None and order_by is None:
+            raise ValueError("start_after requires order_by")
+        after = (sort_key(start_after[0]), start_after[1]) if start_after is not None else None
+
+        with self._lock:
+            docs = self._collections.get(collection, {})
+            index, keys = _plan_hash_lookup(self._hash_indexes.get(collection, []), filters)
+            buckets = index.buckets(keys) if index is not None else None
+
+            sorted_index = None
+            if order_by is not None and limit is not None:
+                sorted_index = self._sorted_indexes.get(collection, {}).get(order_by[0])
+            if sorted_index is not None and buckets is not None:
+                # Walking the ordered index visits about limit * N / matches
+                # entries; prefer it only when that beats the hash candidates
+                candidate_count = sum(len(ids) for ids in buckets)
+                expected_walk = limit * len(docs) / max(candidate_count, 1)
+                if expected_walk > candidate_count:
+                    sorted_index = None
+
+            if sorted_index is not None:
+                results = []
+                if limit > 0:
+                    descending = order_by[1] == 'DESCENDING'
+                    for doc_id in sorted_index.walk(descending, after):
+                        data = docs[doc_id]
+                        if matches(data, filters):
+                            results.append((doc_id, data))
+                            if len(results) >= limit:
+                                break
+            else:
+                if buckets is not None:
+                    candidates = ((doc_id, docs[doc_id]) for doc_id in set().union(*buckets))
+                else:
+                    candidates = docs.items()
+                results = [(doc_id, data) for doc_id, data in candidates if matches(data, filters)]
+                if after is not None:
+                    results = _after(results, order_by, after)
+                if order_by is not None:
+                    results = _top_k(results, order_by, limit)
+                elif limit is not None:
+                    results = results[:limit]
+
+        for doc_id, data in results:
+            yield doc_id, dict(data)
+
+
+def _order_key(field: str) -> Callable[[Tuple[str, Dict[str, Any]]], Tuple]:
+    return lambda item: (sort_key(item[1][field]), item[0])
+
+
+def _after(results: List[Tuple[str, Dict[str, Any]]], order_by: Tuple[str, str],
+           after: Tuple) -> List[Tuple[str, Dict[str, Any]]]:
+    """Drop results at or before a cursor position"""
+    field, direction = order_by
+    key = _order_key(field)
+    results = [item for item in results if field in item[1]]
+    if direction == 'DESCENDING':
+        return [item for item in results if key(item) < after]
+    return [item for item in results if key(item) > after]
+
+
+def _top_k(results: List[Tuple[str, Dict[str, Any]]], order_by: Tuple[str, str],
+           limit: Optional[int]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Order results without an index, using a bounded heap when limited"""
+    field, direction = order_by
+    key = _order_key(field)
+    results = [item for item in results if field in item[1]]
+    descending = direction == 'DESCENDING'
+    if limit is None:
+        results.sort(key=key, reverse=descending)
+        return results
+    if descending:
+        return heapq.nlargest(limit, results, key=key)
+    return heapq.nsmallest(limit, results, key=key)
@@ -1,11 +1,24 @@
 """
 Pydantic models for API request/response validation
 """
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_serializer, model_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 import uuid
 
+from slots import MINUTES_PER_DAY, format_time, parse_time
+
+APPOINTMENT_STATUSES = ['pending', 'confirmed', 'completed', 'cancelled']
+# Appointments in these states hold their time slot
+ACTIVE_APPOINTMENT_STATUSES = ['pending', 'confirmed']
+
+# Length of appointments booked without one, including those stored before durations
+DEFAULT_APPOINTMENT_MINUTES = 30
+MAX_APPOINTMENT_MINUTES = 8 * 60
+
+TIME_PATTERN = r'^([01][0-9]|2[0-3]):[0-5][0-9]$'
+DATE_PATTERN = r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$'
+
 class StatusCheckCreate(BaseModel):
     """Model for creating a new status check"""
     client_name: str = Field(..., min_length=1, max_length=100)
@@ -18,10 +31,9 @@ class StatusCheck(BaseModel):
     message: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @field_serializer('timestamp', when_used='json')
+    def serialize_timestamp(self, value: datetime) -> str:
+        return value.isoformat()
 
 class ContactFormCreate(BaseModel):
     """Model for contact form submission"""
@@ -48,10 +60,9 @@ class ContactForm(BaseModel):
     submitted_at: datetime = Field(default_factory=datetime.utcnow)
     status: str = Field(default="new")
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @field_serializer('submitted_at', when_used='json')
+    def serialize_submitted_at(self, value: datetime) -> str:
+        return value.isoformat()
 
 class AppointmentCreate(BaseModel):
     """Model for creating a new appointment"""
@@ -61,9 +72,21 @@ class AppointmentCreate(BaseModel):
     business: Optional[str] = Field(None, max_length=100)
     industry: Optional[str] = Field(None, max_length=50)
     service_interests: Optional[str] = Field(None, max_length=200)
-    appointment_date: str = Field(..., description="Date in YYYY-MM-DD format")
-    appointment_time: str = Field(..., description="Time in HH:MM format")
+    appointment_date: str = Field(..., pattern=DATE_PATTERN, description="Date in YYYY-MM-DD format")
+    appointment_time: str = Field(..., pattern=TIME_PATTERN, description="Time in HH:MM format")
+    duration_minutes: int = Field(DEFAULT_APPOINTMENT_MINUTES, ge=5, le=MAX_APPOINTMENT_MINUTES)
+    consultant: Optional[str] = Field(None, min_length=1, max_length=100, description="Consultant or room to book; none for the shared calendar")
     message: Optional[str] = Field(None, max_length=1000)
+    
+    @model_validator(mode='after')
+    def check_same_day(self):
+        try:
+            date.fromisoformat(self.appointment_date)
+        except ValueError:
+            raise ValueError("appointment_date is not a valid date")
+        if parse_time(self.appointment_time) + self.duration_minutes > MINUTES_PER_DAY:
+            raise ValueError("Appointment must end by midnight")
+        return self
 
 class Appointment(BaseModel):
     """Model for appointment response"""
@@ -76,14 +99,39 @@ class Appointment(BaseModel):
     service_interests: Optional[str] = None
     appointment_date: str
     appointment_time: str
+    duration_minutes: int = DEFAULT_APPOINTMENT_MINUTES
+    end_time: Optional[str] = None
+    consultant: Optional[str] = None
     message: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     status: str = Field(default="pending")  # pending, confirmed, completed, cancelled
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @model_validator(mode='after')
+    def fill_end_time(self):
+        # Stored so the database can check overlaps with plain range filters
+        if self.end_time is None:
+            start = parse_time(self.appointment_time)
+            if start is not None:
+                self.end_time = format_time(start + self.duration_minutes)
+        return self
+    
+    @field_serializer('created_at', when_used='json')
+    def serialize_created_at(self, value: datetime) -> str:
+        return value.isoformat()
+
+class BulkImportRow(BaseModel):
+    """Outcome of one NDJSON line in a bulk import"""
+    line: int
+    status: str  # created, invalid, conflict, failed
+    id: Optional[str] = None
+    errors: List[str] = Field(default_factory=list)
+
+class BulkImportResult(BaseModel):
+    """Per-row report of a bulk import"""
+    total: int
+    created: int
+    rejected: int
+    results: List[BulkImportRow]
 
 class APIResponse(BaseModel):
     """Standard API response model"""
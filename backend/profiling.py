@@ -0,0 +1,122 @@
+"""
+Opt-in sampling of per-request cProfile data
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Request header that forces a profile of that request (honored in DEBUG only)
+PROFILE_HEADER = b'x-profile'
+
+_NAME_PATTERN = re.compile(r'^[\w.-]+\.prof$')
+
+
+class RequestProfiler:
+    """Profiles a sample of requests and keeps the newest dumps on disk.
+
+    Only one request is profiled at a time: cProfile attaches to the event
+    loop thread, so a profile also contains any other coroutines that ran
+    while the profiled request was awaiting. Database calls run on the
+    thread pool and show up as time spent awaiting them.
+    """
+
+    def __init__(self, directory: str, sample_rate: float, max_files: int = 100, allow_header: bool = False):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.allow_header = allow_header
+        self._busy = threading.Lock()
+
+    def should_profile(self, scope) -> bool:
+        if self.allow_header:
+            for name, value in scope.get('headers', ()):
+                if name == PROFILE_HEADER:
+                    return value not in (b'0', b'false')
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _path(self, name: str) -> str:
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid profile name: {name}")
+        return os.path.join(self.directory, name)
+
+    def save(self, profile: cProfile.Profile, name: str):
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(self._path(name))
+        for stale in self.list()[self.max_files:]:
+            try:
+                os.remove(self._path(stale))
+            except OSError:
+                pass
+
+    def list(self) -> List[str]:
+        """Saved profile names, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [name for name in os.listdir(self.directory) if _NAME_PATTERN.match(name)]
+        return sorted(names, reverse=True)
+
+    def report(self, name: str, sort: str = 'cumulative', limit: int = 50) -> Optional[str]:
+        """pstats text report of a saved profile, or None if it does not exist"""
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running sampled requests under cProfile.
+
+    Profiled responses carry an ``X-Profile-Id`` header naming the dump,
+    which the admin profile endpoints can then render.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.profiler.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self.profiler._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        started = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        route = re.sub(r'[^\w-]+', '_', scope['path'], flags=re.ASCII).strip('_') or 'root'
+        name = f"{started}-{scope['method']}-{route}.prof"
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [(b'x-profile-id', name.encode('ascii'))]
+            await send(message)
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                profile.disable()
+        finally:
+            self.profiler._busy.release()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                await asyncio.to_thread(self.profiler.save, profile, name)
+                logger.info("Profiled %s %s in %.1f ms as %s", scope['method'], scope['path'], elapsed_ms, name)
+            except Exception as e:
+                logger.error("Failed to save profile %s: %s", name, e)
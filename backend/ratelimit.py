@@ -0,0 +1,214 @@
+"""
+Token-bucket rate limiting for the public form endpoints
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of a shard for idle buckets
+SWEEP_INTERVAL = 60.0
+
+# Largest body inspected for an email address; bigger bodies skip that check
+MAX_INSPECTED_BODY = 64 * 1024
+
+
+class _Shard:
+    __slots__ = ('buckets', 'lock', 'next_sweep')
+
+    def __init__(self):
+        self.buckets: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+        self.next_sweep = time.monotonic() + SWEEP_INTERVAL
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets holding up to ``burst`` tokens, refilled at ``rate`` per second.
+
+    Keys hash onto a fixed set of shards, each with its own lock, so a
+    check costs one dict lookup. A bucket left alone long enough to refill
+    completely is indistinguishable from a new one, so each shard drops
+    such buckets when it is next used after ``SWEEP_INTERVAL``.
+    """
+
+    def __init__(self, rate: float, burst: int, shards: int = 64):
+        self.rate = rate
+        self.burst = float(burst)
+        self._idle = self.burst / rate
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def acquire(self, key: str) -> float:
+        """Take a token for ``key``; returns 0 if allowed, else seconds until one is free"""
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with shard.lock:
+            if now >= shard.next_sweep:
+                self._sweep(shard, now)
+            bucket = shard.buckets.get(key)
+            if bucket is None:
+                shard.buckets[key] = [self.burst - 1, now]
+                return 0.0
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+
+    def _sweep(self, shard: _Shard, now: float):
+        idle = [key for key, (_, last) in shard.buckets.items() if now - last >= self._idle]
+        for key in idle:
+            del shard.buckets[key]
+        shard.next_sweep = now + SWEEP_INTERVAL
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+
+class SharedWindowLimiter:
+    """Fixed-window request counts per key in shared state, enforced across every worker.
+
+    Each key may make ``limit`` requests per ``window`` seconds. Counters
+    are created with the window as their ttl, so they expire on their own.
+    Keys are hashed, so emails never appear in the shared store.
+    """
+    # acquire() makes a network round trip and must run off the event loop
+    blocking = True
+
+    def __init__(self, state, name: str, limit: int, window: int):
+        self._state = state
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def acquire(self, key: str) -> float:
+        """Count a request for ``key``; returns 0 if allowed, else seconds until the window ends"""
+        now = time.time()
+        window_index = int(now // self.window)
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+        count = self._state.incr(f'ratelimit:{self.name}:{window_index}:{digest}', ttl=self.window)
+        if count <= self.limit:
+            return 0.0
+        return (window_index + 1) * self.window - now
+
+
+async def _acquire(limiter, key: str) -> float:
+    if not getattr(limiter, 'blocking', False):
+        return limiter.acquire(key)
+    try:
+        return await asyncio.to_thread(limiter.acquire, key)
+    except Exception as e:
+        # An unreachable shared store must not take the forms down with it
+        logger.error("Rate limit check failed, allowing the request: %s", e)
+        return 0.0
+
+
+def _client_ip(scope, trust_proxy: bool, proxy_hops: int = 1) -> str:
+    """The client address, read from X-Forwarded-For when behind ``proxy_hops`` trusted proxies.
+
+    Each proxy appends the address it received the request from, so only
+    the entry ``proxy_hops`` from the right is known to be genuine; the
+    entries left of it are whatever the client sent.
+    """
+    if trust_proxy:
+        forwarded = [entry.strip() for name, value in scope.get('headers', ())
+                     if name == b'x-forwarded-for' for entry in value.split(b',')]
+        forwarded = [entry for entry in forwarded if entry]
+        if forwarded:
+            return forwarded[-min(proxy_hops, len(forwarded))].decode('latin-1')
+    client = scope.get('client')
+    return client[0] if client else 'unknown'
+
+
+def _email(body: bytes) -> Optional[str]:
+    if not body or len(body) > MAX_INSPECTED_BODY:
+        return None
+    try:
+        email = orjson.loads(body).get('email')
+    except (orjson.JSONDecodeError, AttributeError):
+        return None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware limiting POSTs to ``paths`` per client IP and per email.
+
+    Limited requests get a 429 with Retry-After before the body is
+    validated or anything is written. The email check reads the body once
+    and replays it to the application.
+    """
+
+    def __init__(self, app, paths: Iterable[str], ip_limiter: TokenBucketLimiter,
+                 email_limiter: Optional[TokenBucketLimiter] = None, trust_proxy: bool = False,
+                 proxy_hops: int = 1):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.ip_limiter = ip_limiter
+        self.email_limiter = email_limiter
+        self.trust_proxy = trust_proxy
+        self.proxy_hops = max(1, proxy_hops)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        wait = await _acquire(self.ip_limiter, _client_ip(scope, self.trust_proxy, self.proxy_hops))
+        if wait:
+            await self._reject(send, 'ip', wait)
+            return
+
+        if self.email_limiter is not None:
+            # Buffer only as much as the email check inspects; the rest streams through
+            chunks, size, more_body = [], 0, True
+            while more_body and size <= MAX_INSPECTED_BODY:
+                message = await receive()
+                if message['type'] != 'http.request':
+                    await self.app(scope, receive, send)
+                    return
+                chunk = message.get('body', b'')
+                chunks.append(chunk)
+                size += len(chunk)
+                more_body = message.get('more_body', False)
+            body = b''.join(chunks)
+
+            email = _email(body) if not more_body else None
+            if email is not None:
+                wait = await _acquire(self.email_limiter, email)
+                if wait:
+                    await self._reject(send, 'email', wait)
+                    return
+
+            replayed = False
+
+            async def replay():
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {'type': 'http.request', 'body': body, 'more_body': more_body}
+                return await receive()
+
+            await self.app(scope, replay, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def _reject(self, send, limited_by: str, wait: float):
+        RATE_LIMITED.labels(limited_by).inc()
+        body = orjson.dumps({'detail': 'Too many submissions. Please try again later.'})
+        headers: List[Tuple[bytes, bytes]] = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+            (b'retry-after', str(max(1, int(wait + 0.999))).encode('ascii')),
+        ]
+        await send({'type': 'http.response.start', 'status': 429, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,48 @@
+"""
+Response helpers for serving stored documents
+"""
+from datetime import date, datetime
+from typing import Any, Iterable, Type
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def json_default(value: Any):
+    """orjson hook for values it does not encode natively.
+
+    orjson only handles the exact datetime types, while Firestore returns
+    timestamps as a datetime subclass (DatetimeWithNanoseconds).
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any, option: int = 0) -> bytes:
+    """orjson.dumps that also accepts values read back from Firestore"""
+    return orjson.dumps(content, default=json_default, option=option)
+
+
+class DocumentsResponse(ORJSONResponse):
+    """ORJSONResponse for content holding stored values"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def trusted_documents_response(docs: Iterable[Any], model: Type[BaseModel]) -> ORJSONResponse:
+    """Serialize stored documents straight to JSON, projected onto ``model``'s fields.
+
+    Returning a Response bypasses FastAPI's response_model validation, so
+    each row is neither rebuilt as a model nor validated a second time.
+    """
+    fields = tuple(model.model_fields)
+    rows = []
+    for doc in docs:
+        data = doc.to_dict()
+        rows.append({field: data.get(field) for field in fields})
+    return DocumentsResponse(rows)
@@ -2,27 +2,111 @@
 Lead G API Server - FastAPI with Firebase Firestore
 A modern, scalable API for Lead Generation services
 """
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
 import logging
-from datetime import datetime
-from typing import List
+import zlib
+from datetime import datetime, timezone, date as date_type
+from zoneinfo import ZoneInfo
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple
+from pydantic import BaseModel, ValidationError
 
 # Local imports
 from config import settings
-from database import firebase_db
+from database import async_firebase_db, shared_state, encode_cursor, decode_cursor, WriteQueueFull
+from events import ChangeFeed
+from export import EXPORT_FORMATS, stream_export
+import metrics
+from profiling import ProfilingMiddleware, RequestProfiler
+from ratelimit import RateLimitMiddleware, SharedWindowLimiter, TokenBucketLimiter
+from responses import trusted_documents_response
+from shared_state import WORKER_ID
+from slots import IntervalIndex, format_time, parse_business_hours, parse_time
+from stats import CollectionStats, change_fields, day_of, field_value
+from structured_logging import setup_logging, stop_logging
 from models import (
     StatusCheck, StatusCheckCreate,
     ContactForm, ContactFormCreate,
     Appointment, AppointmentCreate,
-    APIResponse
+    APIResponse, BulkImportRow, BulkImportResult,
+    APPOINTMENT_STATUSES, ACTIVE_APPOINTMENT_STATUSES,
+    DEFAULT_APPOINTMENT_MINUTES, MAX_APPOINTMENT_MINUTES
 )
 
+# Fields that identify a calendar, and the [start, end) fields of a booking in
+# it; active appointments in the same calendar must not overlap
+APPOINTMENT_SLOT_FIELDS = ('appointment_date', 'consultant')
+APPOINTMENT_INTERVAL_FIELDS = ('appointment_time', 'end_time')
+
+# Longest span served by the availability range endpoint
+MAX_AVAILABILITY_RANGE_DAYS = 366
+
+# Most start times returned by one free-slot search
+MAX_FREE_SLOTS = 500
+
+# Rows validated and written per batch by the bulk import endpoints
+BULK_CHUNK_ROWS = 500
+
+# Intervals booked by active appointments, kept in step with every booking write
+slot_index = IntervalIndex(slot_minutes=settings.SLOT_MINUTES)
+
+# Opening windows per weekday searched for free slots
+business_hours = parse_business_hours(settings.BUSINESS_HOURS)
+business_timezone = ZoneInfo(settings.BUSINESS_TIMEZONE)
+
+# Channel carrying slot occupancy changes between workers
+SLOT_CHANGES_CHANNEL = 'appointment-slot-changes'
+
+# Appointments whose slots changed while a resync was reading, or None
+_slots_changed_during_resync: Optional[Set[str]] = None
+_resync_task: Optional[asyncio.Task] = None
+
+# Document counts per dimension, kept in step with every create and status
+# update so the admin dashboard never scans a collection. With shared state
+# the counts live there instead and these only name the dimensions
+collection_stats = {
+    'contact_forms': CollectionStats({
+        'status': field_value('status'),
+        'industry': field_value('industry'),
+        'service': field_value('service'),
+        'day': day_of('submitted_at', business_timezone),
+    }),
+    'appointments': CollectionStats({
+        'status': field_value('status'),
+        'industry': field_value('industry'),
+        'service': field_value('service_interests'),
+        'day': day_of('created_at', business_timezone),
+    }),
+}
+
+# One document per data migration, written once it has finished
+MIGRATIONS_COLLECTION = 'migrations'
+
+# Field each counted collection is scanned in order of at startup
+STATS_ORDER_FIELDS = {'contact_forms': 'submitted_at', 'appointments': 'created_at'}
+
+# Most days of daily counts returned by the stats endpoint
+MAX_STATS_DAYS = 366
+
+# Shared hash of a collection's counts, one `dimension:key` field per count
+STATS_KEY = 'stats:{}'
+# Field set in that hash once the collection has been counted
+STATS_COUNTED_FIELD = 'counted'
+# How long a worker counting a collection keeps others from doing the same
+STATS_CLAIM_SECONDS = 3600
+
+# Appointment and contact form changes streamed to admin clients
+change_feed = ChangeFeed()
+CHANGE_FEED_CHANNEL = 'change-feed'
+
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+setup_logging(
+    level=settings.LOG_LEVEL,
+    log_format=settings.LOG_FORMAT,
+    asynchronous=settings.LOG_ASYNC,
+    info_sample_rate=settings.LOG_INFO_SAMPLE_RATE
 )
 logger = logging.getLogger(__name__)
 
@@ -31,10 +115,41 @@ app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="Modern API for Lead Generation services with Firebase backend",
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
 )
 
+def _rate_limiter(name: str, per_window: float, burst: int, window: int):
+    """A limiter allowing ``per_window`` requests per ``window`` seconds after a ``burst``.
+
+    With shared state every worker counts against one fixed-window budget of
+    the same size; a single worker uses an in-memory token bucket.
+    """
+    if shared_state.remote:
+        return SharedWindowLimiter(shared_state, name, int(per_window) + burst, window)
+    return TokenBucketLimiter(per_window / window, burst)
+
+# Public form submissions are rate limited before their bodies are validated;
+# added first so 429 responses still pass through CORS
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        paths=[f"{settings.API_V1_STR}/contact", f"{settings.API_V1_STR}/appointments"],
+        ip_limiter=_rate_limiter('ip', settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST, 60),
+        email_limiter=_rate_limiter('email', settings.RATE_LIMIT_EMAIL_PER_HOUR, settings.RATE_LIMIT_EMAIL_BURST, 3600),
+        trust_proxy=settings.RATE_LIMIT_TRUST_PROXY,
+        proxy_hops=settings.RATE_LIMIT_PROXY_HOPS
+    )
+    # One bulk request can carry many rows, so imports get a far smaller budget
+    app.add_middleware(
+        RateLimitMiddleware,
+        paths=[f"{settings.API_V1_STR}/contact/bulk", f"{settings.API_V1_STR}/appointments/bulk"],
+        ip_limiter=_rate_limiter('bulk', settings.RATE_LIMIT_BULK_PER_HOUR, settings.RATE_LIMIT_BULK_BURST, 3600),
+        trust_proxy=settings.RATE_LIMIT_TRUST_PROXY,
+        proxy_hops=settings.RATE_LIMIT_PROXY_HOPS
+    )
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -42,7 +157,315 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+)
+
+# Request profiling costs nothing unless enabled or in debug mode
+profiler = RequestProfiler(
+    settings.PROFILING_DIR,
+    sample_rate=settings.PROFILING_SAMPLE_RATE if settings.PROFILING_ENABLED else 0.0,
+    max_files=settings.PROFILING_MAX_FILES,
+    allow_header=settings.DEBUG
 )
+if settings.PROFILING_ENABLED or settings.DEBUG:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Outermost, so latency covers CORS handling and error responses too
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+def _start_after(query, field: str, cursor: Optional[str]):
+    """Resume a listing query after an opaque cursor from a previous page"""
+    if not cursor:
+        return query
+    try:
+        return query.start_after(decode_cursor(cursor, field))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def _set_next_cursor(response: Response, docs: list, field: str, limit: int):
+    """Expose the cursor for the next page when this page came back full"""
+    if limit > 0 and len(docs) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1], field)
+
+def _etag(version: str, request: Request) -> str:
+    """Entity tag for a response built from ``version`` and the request's query"""
+    return f'W/"{version}-{zlib.crc32(request.url.query.encode("utf-8")):08x}"'
+
+def _not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Tag the response, or return a 304 if the client already holds this version"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers))
+    return None
+
+def _documents_response(docs: list, model, response: Response):
+    """Return stored documents, skipping re-validation when reads are trusted"""
+    if settings.TRUSTED_READS:
+        # A returned Response bypasses the injected one, so carry its headers over
+        trusted = trusted_documents_response(docs, model)
+        for header in ("X-Next-Cursor", "ETag", "Cache-Control"):
+            if header in response.headers:
+                trusted.headers[header] = response.headers[header]
+        return trusted
+    return [model(**doc.to_dict()) for doc in docs]
+
+def _export_response(collection_name: str, order_field: str, model, export_format: str, status_filter: Optional[str]):
+    """Stream a whole collection, newest first, as NDJSON or CSV"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    query = async_firebase_db.get_collection(collection_name).order_by(order_field, direction='DESCENDING')
+    if status_filter:
+        query = query.where('status', '==', status_filter)
+    
+    filename = f"{collection_name}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    logger.info("Exporting %s as %s", collection_name, export_format)
+    return StreamingResponse(
+        stream_export(query.iterate(order_field), list(model.model_fields), export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _write_queue_full() -> HTTPException:
+    """Backpressure response when the write-behind queue is saturated"""
+    logger.warning("Write-behind queue full, rejecting submission")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many submissions right now. Please try again shortly.",
+        headers={"Retry-After": "1"}
+    )
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield (line number, line) for each non-blank line of a streamed NDJSON body"""
+    line_number = 0
+    pending = b''
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if pending.strip():
+        yield line_number + 1, pending
+
+async def _bulk_import(request: Request, create_model, model,
+                       write_chunk: Callable[[List[BaseModel]], Awaitable[List[bool]]]) -> BulkImportResult:
+    """Validate NDJSON rows in chunks and hand each chunk of valid rows to ``write_chunk``.
+
+    ``write_chunk`` returns one flag per row, False when the row conflicts.
+    A chunk whose write fails marks only its own rows as failed. Reading
+    stops at the first line past ``BULK_MAX_ROWS``.
+    """
+    results: List[BulkImportRow] = []
+    chunk: List[Tuple[int, BaseModel]] = []
+    
+    async def flush():
+        items = [item for _, item in chunk]
+        try:
+            created = await write_chunk(items)
+        except Exception as e:
+            logger.error("Bulk import chunk of %d %s rows failed: %s", len(items), model.__name__, e)
+            created = [None] * len(items)
+        for (line_number, item), ok in zip(chunk, created):
+            if ok:
+                results.append(BulkImportRow(line=line_number, status="created", id=item.id))
+            elif ok is None:
+                results.append(BulkImportRow(line=line_number, status="failed", errors=["Failed to save row"]))
+            else:
+                results.append(BulkImportRow(line=line_number, status="conflict",
+                                             errors=["This appointment slot is already booked"]))
+        chunk.clear()
+    
+    async for line_number, line in _ndjson_lines(request):
+        if line_number > settings.BULK_MAX_ROWS:
+            results.append(BulkImportRow(line=line_number, status="invalid", errors=[
+                f"Imports are limited to {settings.BULK_MAX_ROWS} lines; this and later lines were not read"
+            ]))
+            break
+        try:
+            chunk.append((line_number, model(**create_model.model_validate_json(line).model_dump())))
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in e.errors()]
+            results.append(BulkImportRow(line=line_number, status="invalid", errors=errors))
+            continue
+        if len(chunk) >= BULK_CHUNK_ROWS:
+            await flush()
+    if chunk:
+        await flush()
+    
+    results.sort(key=lambda row: row.line)
+    created = sum(1 for row in results if row.status == "created")
+    logger.info("Bulk imported %d of %d %s rows", created, len(results), model.__name__)
+    return BulkImportResult(total=len(results), created=created, rejected=len(results) - created, results=results)
+
+async def _write_contact_forms(contact_forms: List[ContactForm]) -> List[bool]:
+    await async_firebase_db.set_many('contact_forms', [(form.id, form.model_dump()) for form in contact_forms])
+    stats = collection_stats['contact_forms']
+    await _change_stats('contact_forms', [change for form in contact_forms for change in stats.changes(form.model_dump())])
+    return [True] * len(contact_forms)
+
+async def _write_appointments(appointments: List[Appointment]) -> List[bool]:
+    """Book a chunk of appointments, checking slots for the whole set at once"""
+    created = [False] * len(appointments)
+    
+    # Drop rows overlapping a booking the index already holds, or an
+    # earlier row of this chunk, before touching the database
+    claimed = IntervalIndex(slot_minutes=settings.SLOT_MINUTES)
+    candidates = []
+    for position, appointment in enumerate(appointments):
+        booking = _booking(appointment.model_dump())
+        if not claimed.is_free(*booking[1:]):
+            continue
+        if not slot_index.is_free(*booking[1:]) and await _slot_known_taken(booking):
+            continue
+        claimed.add(*booking)
+        candidates.append(position)
+    
+    if candidates:
+        reserved = await async_firebase_db.get_collection('appointments').create_many_if_absent(
+            [(appointments[position].id, appointments[position].model_dump()) for position in candidates],
+            unique_fields=APPOINTMENT_SLOT_FIELDS,
+            filters=[('status', 'in', ACTIVE_APPOINTMENT_STATUSES)],
+            interval=APPOINTMENT_INTERVAL_FIELDS
+        )
+        changes, counted = [], []
+        for position, ok in zip(candidates, reserved):
+            if ok:
+                created[position] = True
+                data = appointments[position].model_dump()
+                changes.append((*_booking(data), 1))
+                counted.extend(collection_stats['appointments'].changes(data))
+        await _change_slots(changes)
+        await _change_stats('appointments', counted)
+    return created
+
+def _booking(appointment: dict) -> Optional[Tuple[str, str, Optional[str], int, int]]:
+    """(id, date, consultant, start, end) of a stored appointment, None if its time is malformed"""
+    start = parse_time(appointment.get('appointment_time'))
+    if start is None:
+        return None
+    duration = appointment.get('duration_minutes') or DEFAULT_APPOINTMENT_MINUTES
+    return appointment['id'], appointment['appointment_date'], appointment.get('consultant'), start, start + duration
+
+def _apply_slot_changes(changes: List[tuple]):
+    for *booking, delta in changes:
+        if _slots_changed_during_resync is not None:
+            _slots_changed_during_resync.add(booking[0])
+        if delta > 0:
+            slot_index.add(*booking)
+        else:
+            slot_index.remove(*booking)
+
+async def _slot_known_taken(booking: tuple) -> bool:
+    """Whether the database confirms a booking the index holds over ``booking``'s interval.
+
+    The index is fed by pub/sub messages, which can be lost. Rather than
+    answer 409 on its word alone, the overlapping holders are read back;
+    holders that were cancelled, deleted or moved are corrected in the index.
+    """
+    collection = async_firebase_db.get_collection('appointments')
+    for start, end, holder_id in slot_index.overlapping(*booking[1:]):
+        doc = await collection.document(holder_id).get()
+        data = {**doc.to_dict(), 'id': holder_id} if doc.exists else {}
+        held = _booking(data) if data.get('status') in ACTIVE_APPOINTMENT_STATUSES else None
+        if held == (holder_id, booking[1], booking[2], start, end):
+            return True
+        logger.warning("Slot index held stale appointment %s; correcting it", holder_id)
+        slot_index.discard(holder_id)
+        if held is not None:
+            slot_index.add(*held)
+    return not slot_index.is_free(*booking[1:])
+
+async def _resync_slot_index() -> int:
+    """Reconcile the slot index with the active appointments in the database"""
+    global _slots_changed_during_resync
+    _slots_changed_during_resync = set()
+    try:
+        active = await async_firebase_db.get_collection('appointments')\
+            .where('status', 'in', ACTIVE_APPOINTMENT_STATUSES)\
+            .get()
+        bookings = [_booking({**doc.to_dict(), 'id': doc.id}) for doc in active]
+        # Entries changed meanwhile are newer than what was read
+        return slot_index.reconcile([booking for booking in bookings if booking is not None],
+                                    skip=_slots_changed_during_resync)
+    finally:
+        _slots_changed_during_resync = None
+
+async def _resync_slot_index_periodically():
+    while True:
+        await asyncio.sleep(settings.SLOT_INDEX_RESYNC_SECONDS)
+        try:
+            repaired = await _resync_slot_index()
+            if repaired:
+                logger.warning("Slot index resync repaired %d appointments", repaired)
+        except Exception as e:
+            logger.error("Slot index resync failed: %s", e)
+
+async def _change_slots(changes: List[tuple]):
+    """Apply (id, date, consultant, start, end, +1/-1) booking changes here and announce them to other workers"""
+    _apply_slot_changes(changes)
+    if shared_state.remote and changes:
+        try:
+            await asyncio.to_thread(shared_state.publish, SLOT_CHANGES_CHANNEL,
+                                    {'origin': WORKER_ID, 'changes': changes})
+        except Exception as e:
+            logger.error("Failed to publish slot changes: %s", e)
+
+async def _change_stats(collection_name: str, changes: List[tuple]):
+    """Apply (dimension, key, delta) count changes, to the shared counts when workers share state"""
+    if not shared_state.remote:
+        collection_stats[collection_name].apply(changes)
+        return
+    if changes:
+        try:
+            await asyncio.to_thread(shared_state.hincr_many, STATS_KEY.format(collection_name),
+                                    change_fields(changes))
+        except Exception as e:
+            logger.error("Failed to update %s counts: %s", collection_name, e)
+
+async def _current_stats(collection_name: str) -> CollectionStats:
+    """A collection's counts, read from shared state when workers share it"""
+    stats = collection_stats[collection_name]
+    if not shared_state.remote:
+        return stats
+    shared = CollectionStats(stats.dimensions)
+    shared.load_fields(await asyncio.to_thread(shared_state.hget_ints, STATS_KEY.format(collection_name)))
+    return shared
+
+async def _publish_change(event_type: str, data: dict):
+    """Push a change to this worker's admin streams and to the other workers'"""
+    change_feed.publish(event_type, data)
+    if shared_state.remote:
+        try:
+            await asyncio.to_thread(shared_state.publish, CHANGE_FEED_CHANNEL,
+                                    {'origin': WORKER_ID, 'type': event_type, 'data': data})
+        except Exception as e:
+            logger.error("Failed to publish %s change: %s", event_type, e)
+
+def _subscribe_other_workers(loop: asyncio.AbstractEventLoop):
+    """Apply other workers' slot and change events on this worker's event loop"""
+    def on_slot_changes(message):
+        if message.get('origin') != WORKER_ID:
+            loop.call_soon_threadsafe(_apply_slot_changes, message['changes'])
+    
+    def on_change(message):
+        if message.get('origin') != WORKER_ID:
+            loop.call_soon_threadsafe(change_feed.publish, message['type'], message['data'])
+    
+    shared_state.subscribe(SLOT_CHANGES_CHANNEL, on_slot_changes)
+    shared_state.subscribe(CHANGE_FEED_CHANNEL, on_change)
 
 # Health check endpoint
 @app.get("/", response_model=APIResponse)
@@ -63,7 +486,7 @@ async def health_check():
     """Detailed health check endpoint"""
     try:
         # Test Firebase connection
-        firebase_db.db.collection('health_check').limit(1).get()
+        await async_firebase_db.get_collection('health_check').limit(1).get()
         
         return APIResponse(
             success=True,
@@ -74,53 +497,86 @@ async def health_check():
             }
         )
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return JSONResponse(
+        logger.error("Health check failed: %s", e)
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content=APIResponse(
                 success=False,
                 message="Service unavailable",
                 data={"error": str(e)}
-            ).dict()
+            ).model_dump()
         )
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request and database metrics in Prometheus text format"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get(f"{settings.API_V1_STR}/admin/profiles")
+async def list_profiles():
+    """Names of saved request profiles, newest first (admin endpoint)"""
+    if not (settings.PROFILING_ENABLED or settings.DEBUG):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    return {"profiles": profiler.list()}
+
+@app.get(settings.API_V1_STR + "/admin/profiles/{name}")
+async def get_profile(name: str, sort: str = 'cumulative', limit: int = 50):
+    """Text report of one saved request profile (admin endpoint)"""
+    if not (settings.PROFILING_ENABLED or settings.DEBUG):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    try:
+        report = profiler.report(name, sort=sort, limit=limit)
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid profile name or sort key")
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return PlainTextResponse(report)
+
 # Status Check Endpoints
 @app.post(f"{settings.API_V1_STR}/status", response_model=StatusCheck)
 async def create_status_check(status_data: StatusCheckCreate):
     """Create a new status check entry"""
     try:
-        status_check = StatusCheck(**status_data.dict())
+        status_check = StatusCheck(**status_data.model_dump())
         
         # Save to Firebase
-        doc_ref = firebase_db.get_collection('status_checks').document(status_check.id)
-        doc_ref.set(status_check.dict())
+        await async_firebase_db.set_deferred('status_checks', status_check.id, status_check.model_dump())
         
-        logger.info(f"Created status check: {status_check.id}")
+        logger.info("Created status check: %s", status_check.id)
         return status_check
         
+    except WriteQueueFull:
+        raise _write_queue_full()
     except Exception as e:
-        logger.error(f"Failed to create status check: {e}")
+        logger.error("Failed to create status check: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create status check"
         )
 
 @app.get(f"{settings.API_V1_STR}/status", response_model=List[StatusCheck])
-async def get_status_checks(limit: int = 100):
+async def get_status_checks(request: Request, response: Response, limit: int = 100, start_after: Optional[str] = None):
     """Retrieve status checks"""
     try:
-        docs = firebase_db.get_collection('status_checks').order_by('timestamp', direction='DESCENDING').limit(limit).get()
+        etag = _etag(await async_firebase_db.version('status_checks'), request)
+        not_modified = _not_modified(request, response, etag)
+        if not_modified is not None:
+            return not_modified
         
-        status_checks = []
-        for doc in docs:
-            data = doc.to_dict()
-            status_checks.append(StatusCheck(**data))
+        query = async_firebase_db.get_collection('status_checks').order_by('timestamp', direction='DESCENDING')
+        query = _start_after(query, 'timestamp', start_after)
+        docs = await query.limit(limit).get()
+        _set_next_cursor(response, docs, 'timestamp', limit)
         
-        logger.info(f"Retrieved {len(status_checks)} status checks")
-        return status_checks
+        logger.info("Retrieved %d status checks", len(docs))
+        return _documents_response(docs, StatusCheck, response)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to retrieve status checks: {e}")
+        logger.error("Failed to retrieve status checks: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve status checks"
@@ -131,126 +587,179 @@ async def get_status_checks(limit: int = 100):
 async def submit_contact_form(contact_data: ContactFormCreate):
     """Submit a contact form"""
     try:
-        contact_form = ContactForm(**contact_data.dict())
+        contact_form = ContactForm(**contact_data.model_dump())
         
         # Save to Firebase
-        doc_ref = firebase_db.get_collection('contact_forms').document(contact_form.id)
-        doc_ref.set(contact_form.dict())
+        await async_firebase_db.set_deferred('contact_forms', contact_form.id, contact_form.model_dump())
         
-        logger.info(f"Contact form submitted: {contact_form.id} by {contact_form.email}")
+        await _change_stats('contact_forms', collection_stats['contact_forms'].changes(contact_form.model_dump()))
+        await _publish_change('contact.created', contact_form.model_dump())
+        
+        logger.info("Contact form submitted: %s", contact_form.id)
         return contact_form
         
+    except WriteQueueFull:
+        raise _write_queue_full()
     except Exception as e:
-        logger.error(f"Failed to submit contact form: {e}")
+        logger.error("Failed to submit contact form: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to submit contact form"
         )
 
+@app.post(f"{settings.API_V1_STR}/contact/bulk", response_model=BulkImportResult)
+async def bulk_submit_contact_forms(request: Request):
+    """Import contact forms from an NDJSON body, one form per line (admin endpoint)"""
+    result = await _bulk_import(request, ContactFormCreate, ContactForm, _write_contact_forms)
+    if result.created:
+        # One event instead of one per row; clients reload their view
+        await _publish_change('contact.imported', {'created': result.created})
+    return result
+
 @app.get(f"{settings.API_V1_STR}/contact", response_model=List[ContactForm])
-async def get_contact_forms(limit: int = 100, status_filter: str = None):
+async def get_contact_forms(request: Request, response: Response, limit: int = 100, status_filter: str = None, start_after: Optional[str] = None):
     """Retrieve contact forms (admin endpoint)"""
     try:
-        query = firebase_db.get_collection('contact_forms').order_by('submitted_at', direction='DESCENDING')
+        etag = _etag(await async_firebase_db.version('contact_forms'), request)
+        not_modified = _not_modified(request, response, etag)
+        if not_modified is not None:
+            return not_modified
+        
+        query = async_firebase_db.get_collection('contact_forms').order_by('submitted_at', direction='DESCENDING')
         
         if status_filter:
             query = query.where('status', '==', status_filter)
-            
-        docs = query.limit(limit).get()
         
-        contact_forms = []
-        for doc in docs:
-            data = doc.to_dict()
-            contact_forms.append(ContactForm(**data))
+        query = _start_after(query, 'submitted_at', start_after)
+        docs = await query.limit(limit).get()
+        _set_next_cursor(response, docs, 'submitted_at', limit)
         
-        logger.info(f"Retrieved {len(contact_forms)} contact forms")
-        return contact_forms
+        logger.info("Retrieved %d contact forms", len(docs))
+        return _documents_response(docs, ContactForm, response)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to retrieve contact forms: {e}")
+        logger.error("Failed to retrieve contact forms: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve contact forms"
         )
 
+@app.get(f"{settings.API_V1_STR}/contact/export")
+async def export_contact_forms(export_format: str = Query('ndjson', alias='format'), status_filter: str = None):
+    """Stream every contact form as NDJSON or CSV (admin endpoint)"""
+    return _export_response('contact_forms', 'submitted_at', ContactForm, export_format, status_filter)
+
 # Appointment Endpoints
 @app.post(f"{settings.API_V1_STR}/appointments", response_model=Appointment)
 async def create_appointment(appointment_data: AppointmentCreate):
     """Create a new appointment with overlap checking"""
     try:
-        # Check for overlapping appointments
-        appointment_datetime = f"{appointment_data.appointment_date} {appointment_data.appointment_time}"
-        
-        # Query existing appointments for the same date and time
-        existing_appointments = firebase_db.get_collection('appointments')\
-            .where('appointment_date', '==', appointment_data.appointment_date)\
-            .where('appointment_time', '==', appointment_data.appointment_time)\
-            .where('status', 'in', ['pending', 'confirmed'])\
-            .get()
+        appointment = Appointment(**appointment_data.model_dump())
+        booking = _booking(appointment.model_dump())
+        
+        # Overlaps the index already knows about are turned away after reading
+        # back only their holders; the conditional write below settles races
+        created = slot_index.is_free(*booking[1:]) or not await _slot_known_taken(booking)
+        if created:
+            # Reserve the interval and save in one step so overlapping
+            # concurrent bookings cannot both succeed
+            created = await async_firebase_db.get_collection('appointments').create_if_absent(
+                appointment.id,
+                appointment.model_dump(),
+                unique_fields=APPOINTMENT_SLOT_FIELDS,
+                filters=[('status', 'in', ACTIVE_APPOINTMENT_STATUSES)],
+                interval=APPOINTMENT_INTERVAL_FIELDS
+            )
         
-        if len(existing_appointments) > 0:
+        if not created:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="This appointment slot is already booked. Please select a different time."
             )
         
-        appointment = Appointment(**appointment_data.dict())
-        
-        # Save to Firebase
-        doc_ref = firebase_db.get_collection('appointments').document(appointment.id)
-        doc_ref.set(appointment.dict())
+        await _change_slots([(*booking, 1)])
+        await _change_stats('appointments', collection_stats['appointments'].changes(appointment.model_dump()))
+        await _publish_change('appointment.created', appointment.model_dump())
         
-        logger.info(f"Created appointment: {appointment.id} for {appointment.email} on {appointment.appointment_date} at {appointment.appointment_time}")
+        logger.info("Created appointment: %s on %s at %s", appointment.id, appointment.appointment_date, appointment.appointment_time)
         return appointment
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to create appointment: {e}")
+        logger.error("Failed to create appointment: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create appointment"
         )
 
+@app.post(f"{settings.API_V1_STR}/appointments/bulk", response_model=BulkImportResult)
+async def bulk_create_appointments(request: Request):
+    """Import appointments from an NDJSON body, skipping rows whose slot is taken (admin endpoint)"""
+    result = await _bulk_import(request, AppointmentCreate, Appointment, _write_appointments)
+    if result.created:
+        await _publish_change('appointment.imported', {'created': result.created})
+    return result
+
 @app.get(f"{settings.API_V1_STR}/appointments", response_model=List[Appointment])
-async def get_appointments(limit: int = 100, status_filter: str = None):
+async def get_appointments(request: Request, response: Response, limit: int = 100, status_filter: str = None, start_after: Optional[str] = None):
     """Retrieve appointments (admin endpoint)"""
     try:
-        query = firebase_db.get_collection('appointments').order_by('created_at', direction='DESCENDING')
+        etag = _etag(await async_firebase_db.version('appointments'), request)
+        not_modified = _not_modified(request, response, etag)
+        if not_modified is not None:
+            return not_modified
+        
+        query = async_firebase_db.get_collection('appointments').order_by('created_at', direction='DESCENDING')
         
         if status_filter:
             query = query.where('status', '==', status_filter)
-            
-        docs = query.limit(limit).get()
         
-        appointments = []
-        for doc in docs:
-            data = doc.to_dict()
-            appointments.append(Appointment(**data))
+        query = _start_after(query, 'created_at', start_after)
+        docs = await query.limit(limit).get()
+        _set_next_cursor(response, docs, 'created_at', limit)
         
-        logger.info(f"Retrieved {len(appointments)} appointments")
-        return appointments
+        logger.info("Retrieved %d appointments", len(docs))
+        return _documents_response(docs, Appointment, response)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to retrieve appointments: {e}")
+        logger.error("Failed to retrieve appointments: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to retrieve appointments"
         )
 
+@app.get(f"{settings.API_V1_STR}/appointments/export")
+async def export_appointments(export_format: str = Query('ndjson', alias='format'), status_filter: str = None):
+    """Stream every appointment as NDJSON or CSV (admin endpoint)"""
+    return _export_response('appointments', 'created_at', Appointment, export_format, status_filter)
+
+@app.get(f"{settings.API_V1_STR}/appointments/stream")
+async def stream_changes(request: Request):
+    """Server-sent events for appointment and contact form changes (admin endpoint)"""
+    return StreamingResponse(
+        change_feed.stream(request.headers.get('last-event-id')),
+        media_type='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.put(settings.API_V1_STR + "/appointments/{appointment_id}/status")
 async def update_appointment_status(appointment_id: str, status_update: dict):
     """Update appointment status (admin endpoint)"""
     try:
         new_status = status_update.get('status')
-        if new_status not in ['pending', 'confirmed', 'completed', 'cancelled']:
+        if new_status not in APPOINTMENT_STATUSES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid status. Must be one of: pending, confirmed, completed, cancelled"
             )
         
-        doc_ref = firebase_db.get_collection('appointments').document(appointment_id)
-        doc = doc_ref.get()
+        doc_ref = async_firebase_db.get_collection('appointments').document(appointment_id)
+        doc = await doc_ref.get()
         
         if not doc.exists:
             raise HTTPException(
@@ -258,36 +767,79 @@ async def update_appointment_status(appointment_id: str, status_update: dict):
                 detail="Appointment not found"
             )
         
-        doc_ref.update({'status': new_status})
+        # Appointments stored before durations get their interval fields now,
+        # so the overlap check below compares real ranges
+        current = {**doc.to_dict(), 'id': appointment_id}
+        updates = {'status': new_status, **_missing_interval_fields(current)}
+        
+        # Reactivating onto an interval the index knows is booked skips the transaction
+        reactivating = current.get('status') not in ACTIVE_APPOINTMENT_STATUSES and \
+            new_status in ACTIVE_APPOINTMENT_STATUSES
+        booking = _booking(current)
+        if reactivating and booking is not None and not slot_index.is_free(*booking[1:]) \
+                and await _slot_known_taken(booking):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This appointment slot is already booked by another appointment."
+            )
+        
+        # Reactivating an appointment must not double-book its slot
+        previous = await doc_ref.update_if_absent(
+            updates,
+            unique_fields=APPOINTMENT_SLOT_FIELDS,
+            filters=[('status', 'in', ACTIVE_APPOINTMENT_STATUSES)],
+            interval=APPOINTMENT_INTERVAL_FIELDS
+        )
         
-        logger.info(f"Updated appointment {appointment_id} status to {new_status}")
+        if previous is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This appointment slot is already booked by another appointment."
+            )
+        
+        was_active = previous['status'] in ACTIVE_APPOINTMENT_STATUSES
+        is_active = new_status in ACTIVE_APPOINTMENT_STATUSES
+        booking = _booking({**previous, 'id': appointment_id})
+        if booking is not None and was_active and not is_active:
+            await _change_slots([(*booking, -1)])
+        elif booking is not None and is_active and not was_active:
+            await _change_slots([(*booking, 1)])
+        
+        updated = {**previous, **updates}
+        await _change_stats('appointments', collection_stats['appointments'].moved(previous, updated))
+        await _publish_change('appointment.updated', {field: updated.get(field) for field in Appointment.model_fields})
+        
+        logger.info("Updated appointment %s status to %s", appointment_id, new_status)
         return {"success": True, "message": "Appointment status updated successfully"}
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to update appointment status: {e}")
+        logger.error("Failed to update appointment status: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update appointment status"
         )
 
 @app.get(f"{settings.API_V1_STR}/appointments/availability")
-async def check_availability(date: str, time: str = None):
+async def check_availability(request: Request, response: Response, date: str, time: str = None,
+                             duration: int = Query(DEFAULT_APPOINTMENT_MINUTES, ge=1, le=MAX_APPOINTMENT_MINUTES),
+                             consultant: Optional[str] = None):
     """Check appointment availability for a specific date or date/time"""
     try:
-        query = firebase_db.get_collection('appointments')\
-            .where('appointment_date', '==', date)\
-            .where('status', 'in', ['pending', 'confirmed'])
+        not_modified = _not_modified(request, response, _etag(slot_index.fingerprint(date, consultant), request))
+        if not_modified is not None:
+            return not_modified
         
         if time:
-            query = query.where('appointment_time', '==', time)
-        
-        docs = query.get()
-        
-        if time:
-            # Check specific time slot
-            is_available = len(docs) == 0
+            start = parse_time(time)
+            if start is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Time must be in HH:MM format"
+                )
+            # Check whether an appointment of this length fits at that time
+            is_available = slot_index.is_free(date, consultant, start, start + duration)
             return {
                 "available": is_available,
                 "date": date,
@@ -296,56 +848,255 @@ async def check_availability(date: str, time: str = None):
             }
         else:
             # Return booked times for the date
-            booked_times = [doc.to_dict()['appointment_time'] for doc in docs]
+            booked_times = slot_index.booked_times(date, consultant)
             return {
                 "date": date,
                 "booked_times": booked_times,
-                "message": f"Found {len(booked_times)} booked appointments for this date"
+                "message": f"Found {len(booked_times)} booked time slots for this date"
             }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to check availability: {e}")
+        logger.error("Failed to check availability: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to check availability"
         )
 
+@app.get(f"{settings.API_V1_STR}/appointments/availability/range")
+async def check_availability_range(start: str, end: str, consultant: Optional[str] = None):
+    """Booked times for every date in an inclusive date range"""
+    start_date, end_date = _date_range(start, end)
+    return {
+        "start": start,
+        "end": end,
+        "booked_times": slot_index.booked_range(start_date, end_date, consultant)
+    }
+
+@app.get(f"{settings.API_V1_STR}/appointments/free-slots")
+async def find_free_slots(start: str = Query(..., alias='from'), end: str = Query(..., alias='to'),
+                          duration: int = Query(DEFAULT_APPOINTMENT_MINUTES, ge=5, le=MAX_APPOINTMENT_MINUTES),
+                          limit: int = Query(20, ge=1, le=MAX_FREE_SLOTS),
+                          consultant: Optional[str] = None):
+    """The next open start times within business hours where an appointment of ``duration`` fits"""
+    start_date, end_date = _date_range(start, end)
+    found = slot_index.free_slots(start_date, end_date, consultant, duration, business_hours, limit,
+                                  not_before=_business_now())
+    return {
+        "from": start,
+        "to": end,
+        "duration": duration,
+        "slots": [{"date": slot_date, "time": format_time(minute), "end_time": format_time(minute + duration)}
+                  for slot_date, minute in found]
+    }
+
+def _business_now() -> datetime:
+    """Current wall-clock time in the zone appointment times are given in"""
+    return datetime.now(business_timezone).replace(tzinfo=None)
+
+def _date_range(start: str, end: str) -> Tuple[date_type, date_type]:
+    """Parse an inclusive YYYY-MM-DD range of at most MAX_AVAILABILITY_RANGE_DAYS"""
+    try:
+        start_date = date_type.fromisoformat(start)
+        end_date = date_type.fromisoformat(end)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dates must be in YYYY-MM-DD format"
+        )
+    
+    days = (end_date - start_date).days + 1
+    if days < 1 or days > MAX_AVAILABILITY_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range must span 1 to {MAX_AVAILABILITY_RANGE_DAYS} days"
+        )
+    return start_date, end_date
+
+# Stats Endpoint
+@app.get(f"{settings.API_V1_STR}/stats")
+async def get_stats(days: int = Query(30, ge=0, le=MAX_STATS_DAYS)):
+    """Contact form and appointment counts by status, industry, service and day (admin endpoint)"""
+    try:
+        today = _business_now().date()
+        return {
+            collection_name: (await _current_stats(collection_name)).snapshot(days=days, today=today)
+            for collection_name in collection_stats
+        }
+    except Exception as e:
+        logger.error("Failed to retrieve stats: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve stats"
+        )
+
 # Exception handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content=APIResponse(
             success=False,
             message="Endpoint not found"
-        ).dict()
+        ).model_dump()
     )
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    logger.error(f"Internal server error: {exc}")
-    return JSONResponse(
+    logger.error("Internal server error: %s", exc)
+    return ORJSONResponse(
         status_code=500,
         content=APIResponse(
             success=False,
             message="Internal server error"
-        ).dict()
+        ).model_dump()
     )
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    logger.info(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
-    logger.info(f"Environment: {settings.ENVIRONMENT}")
-    logger.info(f"Debug mode: {settings.DEBUG}")
+    logger.info("Starting %s v%s", settings.PROJECT_NAME, settings.VERSION)
+    logger.info("Environment: %s", settings.ENVIRONMENT)
+    logger.info("Debug mode: %s", settings.DEBUG)
+    
+    # Connect the database now so the first request does not pay for it
+    await async_firebase_db.start()
+    
+    # Hear about other workers' bookings before loading the current state
+    global _resync_task
+    if shared_state.remote:
+        _subscribe_other_workers(asyncio.get_running_loop())
+        # Messages can be lost, e.g. while the subscriber reconnects
+        if settings.SLOT_INDEX_RESYNC_SECONDS > 0 and _resync_task is None:
+            _resync_task = asyncio.create_task(_resync_slot_index_periodically())
+    
+    await _backfill_appointment_intervals()
+    
+    # Load booked intervals so availability checks never read documents
+    active = await async_firebase_db.get_collection('appointments')\
+        .where('status', 'in', ACTIVE_APPOINTMENT_STATUSES)\
+        .get()
+    appointments = [{**doc.to_dict(), 'id': doc.id} for doc in active]
+    slot_index.rebuild(booking for booking in map(_booking, appointments) if booking is not None)
+    logger.info("Indexed %d active appointment slots", len(active))
+    
+    for collection_name in collection_stats:
+        if shared_state.remote:
+            await _count_shared_collection(collection_name)
+        else:
+            await _count_collection(collection_name)
+
+def _as_utc(value):
+    """Stored timestamps without a time zone are UTC"""
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+async def _scan_collection(collection_name: str, before: Optional[datetime] = None) -> CollectionStats:
+    """Counts from one paged scan, of documents created before ``before`` when given"""
+    scanned = CollectionStats(collection_stats[collection_name].dimensions)
+    order_field = STATS_ORDER_FIELDS[collection_name]
+    async for doc in async_firebase_db.get_collection(collection_name).order_by(order_field).iterate(order_field):
+        data = doc.to_dict()
+        created = _as_utc(data.get(order_field))
+        if before is not None and isinstance(created, datetime) and created >= before:
+            break
+        scanned.apply(scanned.changes(data))
+    return scanned
+
+async def _count_collection(collection_name: str):
+    """Fill a collection's counts from one paged scan; changes applied meanwhile go to the old counts"""
+    scanned = await _scan_collection(collection_name)
+    collection_stats[collection_name].replace(scanned)
+    logger.info("Counted %d %s", scanned.snapshot(days=0)['total'], collection_name)
+
+async def _count_shared_collection(collection_name: str):
+    """Fill a collection's shared counts the first time any worker starts.
+
+    One worker claims the count. Documents created after it starts are
+    left to the writers' own increments, and increments made before it
+    are replaced by the scanned figures.
+    """
+    key = STATS_KEY.format(collection_name)
+    if STATS_COUNTED_FIELD in await asyncio.to_thread(shared_state.hget_ints, key):
+        return
+    if await asyncio.to_thread(shared_state.incr, f'{key}:claim', 1, STATS_CLAIM_SECONDS) != 1:
+        return
+    cutoff = datetime.now(timezone.utc)
+    already = await asyncio.to_thread(shared_state.hget_ints, key)
+    counted = (await _scan_collection(collection_name, before=cutoff)).fields()
+    amounts = {field: counted.get(field, 0) - already.get(field, 0)
+               for field in counted.keys() | already.keys() if ':' in field}
+    amounts[STATS_COUNTED_FIELD] = 1
+    await asyncio.to_thread(shared_state.hincr_many, key, amounts)
+    logger.info("Counted %s into shared state", collection_name)
+
+def _missing_interval_fields(appointment: dict) -> dict:
+    """Duration, end time and consultant of an appointment stored before durations, {} if it has them"""
+    booking = _booking(appointment)
+    if booking is None or ('end_time' in appointment and 'consultant' in appointment
+                           and appointment.get('duration_minutes')):
+        return {}
+    return {
+        'duration_minutes': booking[4] - booking[3],
+        'end_time': format_time(booking[4]),
+        'consultant': appointment.get('consultant'),
+    }
+
+async def _backfill_appointment_intervals():
+    """Give every appointment stored before durations the fields overlap checks filter on.
+
+    Inactive appointments are included, since reactivating one checks its
+    interval against the active bookings. Runs once per database: a marker
+    document is written when it finishes, and later starts skip it.
+    """
+    marker = async_firebase_db.get_collection(MIGRATIONS_COLLECTION).document('appointment_intervals')
+    if (await marker.get()).exists:
+        return
+    updates = []
+    backfilled = 0
+    async for doc in async_firebase_db.get_collection('appointments').order_by('created_at').iterate('created_at'):
+        missing = _missing_interval_fields({**doc.to_dict(), 'id': doc.id})
+        if missing:
+            updates.append((doc.id, missing))
+        if len(updates) == BULK_CHUNK_ROWS:
+            await async_firebase_db.update_many('appointments', updates)
+            backfilled += len(updates)
+            updates = []
+    if updates:
+        await async_firebase_db.update_many('appointments', updates)
+        backfilled += len(updates)
+    if backfilled:
+        logger.info("Added durations to %d older appointments", backfilled)
+    await marker.set({'completed_at': datetime.utcnow(), 'updated': backfilled})
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release services on shutdown"""
+    global _resync_task
+    if _resync_task is not None:
+        _resync_task.cancel()
+        _resync_task = None
+    async_firebase_db.close()
+    shared_state.close()
+    stop_logging()
 
 if __name__ == "__main__":
     import uvicorn
+    from shared_state import effective_worker_count
+    
+    workers = effective_worker_count(settings)
     uvicorn.run(
         "server:app",
-        host="0.0.0.0",
-        port=8001,
-        reload=settings.DEBUG,
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        # Reloading is a development aid and only works with a single worker
+        reload=settings.DEBUG and settings.RELOAD and workers == 1,
+        # Open event streams would otherwise hold up shutdown indefinitely
+        timeout_graceful_shutdown=10,
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+State shared by every API worker: counters and change notifications
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from responses import json_default
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in published messages, so a worker can skip its own
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+Handler = Callable[[Dict[str, Any]], None]
+
+# Seconds between sweeps of expired in-process counters
+EXPIRY_SWEEP_INTERVAL = 60.0
+
+
+class InProcessState:
+    """Shared state for a single worker process.
+
+    Counters live in a dict and published messages go straight to the
+    local subscribers, so this is only correct with one worker.
+    """
+    remote = False
+
+    def __init__(self):
+        self._counters: Dict[str, int] = {}
+        self._expiry: Dict[str, float] = {}
+        self._hashes: Dict[str, Dict[str, int]] = {}
+        self._next_sweep = time.monotonic() + EXPIRY_SWEEP_INTERVAL
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[int] = None) -> int:
+        """Add to a counter and return the new value; ``ttl`` starts when it is created"""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                # Counters keyed by time window are never touched again once it passes
+                for expired in [name for name, expires in self._expiry.items() if expires <= now]:
+                    self._counters.pop(expired, None)
+                    self._expiry.pop(expired, None)
+                self._next_sweep = now + EXPIRY_SWEEP_INTERVAL
+            expires = self._expiry.get(key)
+            if expires is not None and expires <= now:
+                self._counters.pop(key, None)
+                self._expiry.pop(key, None)
+            value = self._counters.get(key, 0) + amount
+            if key not in self._counters and ttl:
+                self._expiry[key] = now + ttl
+            self._counters[key] = value
+            return value
+
+    def get_int(self, key: str) -> int:
+        with self._lock:
+            expires = self._expiry.get(key)
+            if expires is not None and expires <= time.monotonic():
+                return 0
+            return self._counters.get(key, 0)
+
+    def get_ints(self, keys: List[str]) -> List[int]:
+        """Several counters read at once; missing ones are 0"""
+        return [self.get_int(key) for key in keys]
+
+    def setdefault_int(self, key: str, value: int) -> int:
+        """Set a counter unless it exists, returning its value"""
+        with self._lock:
+            return self._counters.setdefault(key, value)
+
+    def hincr_many(self, key: str, amounts: Dict[str, int]):
+        """Add to several fields of a hash at once"""
+        with self._lock:
+            fields = self._hashes.setdefault(key, {})
+            for field, amount in amounts.items():
+                fields[field] = fields.get(field, 0) + amount
+
+    def hget_ints(self, key: str) -> Dict[str, int]:
+        """Every field of a hash; {} if it does not exist"""
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+    def publish(self, channel: str, message: Dict[str, Any]):
+        for handler in list(self._handlers[channel]):
+            handler(message)
+
+    def subscribe(self, channel: str, handler: Handler):
+        self._handlers[channel].append(handler)
+
+    def close(self):
+        pass
+
+
+class RedisState:
+    """Shared state kept in Redis (or any server speaking its protocol).
+
+    Messages are delivered to subscribers on a background thread.
+    """
+    remote = True
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, socket_timeout=2.0, health_check_interval=30)
+        self._pubsub = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[int] = None) -> int:
+        value = self._redis.incrby(key, amount)
+        if ttl and value == amount:
+            self._redis.expire(key, ttl)
+        return value
+
+    def get_int(self, key: str) -> int:
+        value = self._redis.get(key)
+        return int(value) if value is not None else 0
+
+    def get_ints(self, keys: List[str]) -> List[int]:
+        return [int(value) if value is not None else 0 for value in self._redis.mget(keys)]
+
+    def setdefault_int(self, key: str, value: int) -> int:
+        self._redis.set(key, value, nx=True)
+        return self.get_int(key)
+
+    def hincr_many(self, key: str, amounts: Dict[str, int]):
+        # One transaction, so the fields never show half a change
+        pipeline = self._redis.pipeline(transaction=True)
+        for field, amount in amounts.items():
+            pipeline.hincrby(key, field, amount)
+        pipeline.execute()
+
+    def hget_ints(self, key: str) -> Dict[str, int]:
+        return {field.decode('utf-8'): int(value) for field, value in self._redis.hgetall(key).items()}
+
+    def publish(self, channel: str, message: Dict[str, Any]):
+        self._redis.publish(channel, orjson.dumps(message, default=json_default))
+
+    def subscribe(self, channel: str, handler: Handler):
+        def deliver(raw):
+            try:
+                handler(orjson.loads(raw['data']))
+            except Exception as e:
+                logger.error("Shared state handler for %s failed: %s", channel, e)
+
+        with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{channel: deliver})
+            if self._thread is None:
+                self._thread = self._pubsub.run_in_thread(sleep_time=0.05, daemon=True)
+
+    def close(self):
+        with self._lock:
+            if self._thread is not None:
+                self._thread.stop()
+                self._thread = None
+            if self._pubsub is not None:
+                self._pubsub.close()
+                self._pubsub = None
+        self._redis.close()
+
+
+def create_shared_state(url: Optional[str]):
+    """Redis-backed state when ``url`` is set, otherwise in-process state"""
+    if url:
+        logger.info("Using shared state at %s", url.split('@')[-1])
+        return RedisState(url)
+    return InProcessState()
+
+
+def effective_worker_count(settings) -> int:
+    """Workers to run, falling back to one when state cannot be shared"""
+    workers = max(1, settings.WORKERS)
+    if workers > 1 and settings.DATABASE_BACKEND == 'local':
+        logger.warning("The local database lives in a single process; running 1 worker instead of %d", workers)
+        return 1
+    if workers > 1 and not settings.SHARED_STATE_URL:
+        logger.warning("SHARED_STATE_URL is not set, so workers cannot share state; running 1 worker instead of %d", workers)
+        return 1
+    return workers
@@ -0,0 +1,276 @@
+"""
+Per-date, per-consultant index of booked appointment intervals
+"""
+import bisect
+import zlib
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# An interval in minutes since midnight, [start, end), and who holds it
+Interval = Tuple[int, int, str]
+
+# Where an appointment is held: (date, consultant, start, end)
+Placement = Tuple[str, Optional[str], int, int]
+
+
+def parse_time(time: str) -> Optional[int]:
+    """Minutes since midnight for an HH:MM time, else None"""
+    try:
+        hours, minutes = time.split(':')
+        if len(hours) != 2 or len(minutes) != 2:
+            return None
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        return None
+    if not 0 <= hours < 24 or not 0 <= minutes < 60:
+        return None
+    return hours * 60 + minutes
+
+
+def format_time(minutes: int) -> str:
+    """HH:MM for minutes since midnight; the end of the day is 24:00"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_business_hours(spec: str) -> Dict[int, List[Tuple[int, int]]]:
+    """Opening windows per weekday (0 = Monday) from a template string.
+
+    Entries are separated by ``;``; each names days and comma-separated
+    HH:MM-HH:MM windows, e.g. ``mon-fri 09:00-12:00,13:00-17:00; sat 10:00-14:00``.
+    Days may be a range or a comma-separated list. Raises ValueError.
+    """
+    hours: Dict[int, List[Tuple[int, int]]] = {}
+    for entry in filter(None, (part.strip() for part in spec.split(';'))):
+        try:
+            days, windows = entry.split()
+        except ValueError:
+            raise ValueError(f"Business hours entry must be '<days> <windows>': {entry!r}")
+        weekdays = set()
+        for day in days.lower().split(','):
+            first, _, last = day.partition('-')
+            if first not in WEEKDAYS or (last and last not in WEEKDAYS):
+                raise ValueError(f"Unknown weekday in business hours: {day!r}")
+            start, stop = WEEKDAYS.index(first), WEEKDAYS.index(last or first)
+            # Ranges may wrap around the week, e.g. fri-mon
+            weekdays.update((start + offset) % 7 for offset in range((stop - start) % 7 + 1))
+        for window in windows.split(','):
+            opens, _, closes = window.partition('-')
+            start, end = parse_time(opens), parse_time(closes) if closes != '24:00' else MINUTES_PER_DAY
+            if start is None or end is None or start >= end:
+                raise ValueError(f"Invalid business hours window: {window!r}")
+            for weekday in weekdays:
+                hours.setdefault(weekday, []).append((start, end))
+    for windows in hours.values():
+        windows.sort()
+    return hours
+
+
+class _Calendar:
+    """Intervals of one date and consultant, sorted by start"""
+    __slots__ = ('starts', 'intervals', 'longest')
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.intervals: List[Interval] = []
+        # Longest interval ever added; bounds how far back an overlap can start
+        self.longest = 0
+
+    def insert(self, interval: Interval):
+        position = bisect.bisect_left(self.intervals, interval)
+        self.intervals.insert(position, interval)
+        self.starts.insert(position, interval[0])
+        self.longest = max(self.longest, interval[1] - interval[0])
+
+    def delete(self, interval: Interval):
+        position = bisect.bisect_left(self.intervals, interval)
+        if position < len(self.intervals) and self.intervals[position] == interval:
+            del self.intervals[position]
+            del self.starts[position]
+
+    def overlapping(self, start: int, end: int) -> List[Interval]:
+        # Only intervals starting within `longest` before `start` can reach it
+        low = bisect.bisect_right(self.starts, start - self.longest)
+        high = bisect.bisect_left(self.starts, end)
+        return [interval for interval in self.intervals[low:high] if interval[1] > start]
+
+
+class IntervalIndex:
+    """Booked [start, end) intervals of active appointments, per date and consultant.
+
+    Each calendar keeps its intervals sorted by start. Since no interval is
+    longer than the longest one added, an overlap query bisects to the few
+    intervals that start within that distance and costs O(log n + k) for
+    n bookings and k candidates. Updates are counted per appointment, so
+    an add and remove applied out of order still converge.
+    """
+
+    def __init__(self, slot_minutes: int = 30):
+        if MINUTES_PER_DAY % slot_minutes:
+            raise ValueError("slot_minutes must divide a day evenly")
+        self.slot_minutes = slot_minutes
+        self._calendars: Dict[Tuple[str, Optional[str]], _Calendar] = {}
+        self._counts: Dict[str, int] = {}
+        self._held: Dict[str, Placement] = {}
+
+    def _adjust(self, appointment_id: str, appointment_date: str, consultant: Optional[str],
+                start: int, end: int, delta: int):
+        count = self._counts.get(appointment_id, 0) + delta
+        if count:
+            self._counts[appointment_id] = count
+        else:
+            self._counts.pop(appointment_id, None)
+        if count == 1 and delta > 0:
+            self._insert(appointment_id, (appointment_date, consultant, start, end))
+        elif count == 0 and delta < 0:
+            self._delete(appointment_id, (appointment_date, consultant, start, end))
+
+    def _insert(self, appointment_id: str, placement: Placement):
+        appointment_date, consultant, start, end = placement
+        self._calendars.setdefault((appointment_date, consultant), _Calendar()).insert((start, end, appointment_id))
+        self._held[appointment_id] = placement
+
+    def _delete(self, appointment_id: str, placement: Placement):
+        appointment_date, consultant, start, end = placement
+        calendar = self._calendars.get((appointment_date, consultant))
+        if calendar is not None:
+            calendar.delete((start, end, appointment_id))
+            if not calendar.intervals:
+                del self._calendars[(appointment_date, consultant)]
+        if self._held.get(appointment_id) == placement:
+            del self._held[appointment_id]
+
+    def add(self, appointment_id: str, appointment_date: str, consultant: Optional[str], start: int, end: int):
+        """Mark an interval as held by an active appointment"""
+        self._adjust(appointment_id, appointment_date, consultant, start, end, 1)
+
+    def remove(self, appointment_id: str, appointment_date: str, consultant: Optional[str], start: int, end: int):
+        """Release an interval previously marked with add()"""
+        self._adjust(appointment_id, appointment_date, consultant, start, end, -1)
+
+    def discard(self, appointment_id: str):
+        """Forget an appointment entirely, whatever add() and remove() were applied"""
+        self._counts.pop(appointment_id, None)
+        placement = self._held.get(appointment_id)
+        if placement is not None:
+            self._delete(appointment_id, placement)
+
+    def reconcile(self, bookings: Iterable[Tuple[str, str, Optional[str], int, int]],
+                  skip: Iterable[str] = ()) -> int:
+        """Make the index hold exactly ``bookings``, except for appointments in ``skip``.
+
+        For repairing an index fed by messages that may have been lost;
+        ``skip`` names appointments changed while ``bookings`` was being
+        read, whose entries are already newer. Returns the number repaired.
+        """
+        skip = set(skip)
+        expected = {booking[0]: tuple(booking[1:]) for booking in bookings if booking[0] not in skip}
+        repaired = 0
+        for appointment_id in list(self._held.keys() | self._counts.keys()):
+            if appointment_id in skip or (appointment_id in expected and
+                                          self._held.get(appointment_id) == expected[appointment_id] and
+                                          self._counts.get(appointment_id) == 1):
+                continue
+            self.discard(appointment_id)
+            if appointment_id not in expected:
+                repaired += 1
+        for appointment_id, placement in expected.items():
+            if appointment_id not in self._held:
+                self._counts[appointment_id] = 1
+                self._insert(appointment_id, placement)
+                repaired += 1
+        return repaired
+
+    def overlapping(self, appointment_date: str, consultant: Optional[str], start: int, end: int) -> List[Interval]:
+        """Booked intervals overlapping [start, end)"""
+        calendar = self._calendars.get((appointment_date, consultant))
+        return calendar.overlapping(start, end) if calendar is not None else []
+
+    def is_free(self, appointment_date: str, consultant: Optional[str], start: int, end: int) -> bool:
+        return not self.overlapping(appointment_date, consultant, start, end)
+
+    def intervals(self, appointment_date: str, consultant: Optional[str] = None) -> List[Interval]:
+        """Booked intervals of a date in order of start"""
+        calendar = self._calendars.get((appointment_date, consultant))
+        return list(calendar.intervals) if calendar is not None else []
+
+    def free_slots(self, start: date, end: date, consultant: Optional[str], duration: int,
+                   hours: Dict[int, List[Tuple[int, int]]], limit: int,
+                   not_before: Optional[datetime] = None) -> List[Tuple[str, int]]:
+        """The first ``limit`` (date, minute) starts from ``start`` to ``end`` where ``duration`` fits.
+
+        Starts fall on the ``slot_minutes`` grid inside the weekday's opening
+        windows, and not before ``not_before`` when given. Each window is
+        merged in one pass with the bookings overlapping it, in order of
+        start: bookings starting before the candidate's end are consumed
+        once, and if the furthest end among them lies past the candidate,
+        the candidate jumps there.
+        """
+        found = []
+        current = start
+        earliest = 0
+        if not_before is not None:
+            current = max(start, not_before.date())
+            # A start in the current minute has already begun
+            earliest = not_before.hour * 60 + not_before.minute + 1
+        while current <= end and len(found) < limit:
+            key = current.isoformat()
+            first_day = not_before is not None and current == not_before.date()
+            for opens, closes in hours.get(current.weekday(), ()):
+                booked = self.overlapping(key, consultant, opens, closes)
+                position, reach = 0, opens
+                candidate = self._round_up(max(opens, earliest) if first_day else opens)
+                while candidate + duration <= closes and len(found) < limit:
+                    while position < len(booked) and booked[position][0] < candidate + duration:
+                        reach = max(reach, booked[position][1])
+                        position += 1
+                    if reach > candidate:
+                        candidate = self._round_up(reach)
+                        continue
+                    found.append((key, candidate))
+                    candidate += self.slot_minutes
+            current += timedelta(days=1)
+        return found
+
+    def _round_up(self, minutes: int) -> int:
+        return -(-minutes // self.slot_minutes) * self.slot_minutes
+
+    def booked_times(self, appointment_date: str, consultant: Optional[str] = None) -> List[str]:
+        """Start times of the ``slot_minutes`` grid slots that overlap a booking"""
+        slots = set()
+        for start, end, _ in self.intervals(appointment_date, consultant):
+            slots.update(range(start // self.slot_minutes, -(-end // self.slot_minutes)))
+        return [format_time(slot * self.slot_minutes) for slot in sorted(slots)]
+
+    def booked_range(self, start: date, end: date, consultant: Optional[str] = None) -> Dict[str, List[str]]:
+        """Booked times for every date from ``start`` to ``end`` inclusive"""
+        result = {}
+        current = start
+        while current <= end:
+            key = current.isoformat()
+            result[key] = self.booked_times(key, consultant)
+            current += timedelta(days=1)
+        return result
+
+    def fingerprint(self, appointment_date: str, consultant: Optional[str] = None) -> str:
+        """Short value that changes whenever a date's bookings do.
+
+        Derived from the intervals themselves rather than a counter, so every
+        worker reports the same value once it has applied the same changes.
+        """
+        bounds = array('i')
+        for start, end, _ in self.intervals(appointment_date, consultant):
+            bounds.extend((start, end))
+        return f"{zlib.crc32(bounds.tobytes()) if bounds else 0:08x}"
+
+    def rebuild(self, intervals: Iterable[Tuple[str, str, Optional[str], int, int]]):
+        """Reset the index from (id, date, consultant, start, end) of active appointments"""
+        self._calendars.clear()
+        self._counts.clear()
+        self._held.clear()
+        for appointment_id, appointment_date, consultant, start, end in intervals:
+            self.add(appointment_id, appointment_date, consultant, start, end)
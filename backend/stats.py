@@ -0,0 +1,119 @@
+"""
+Document counts per status, industry, service and day, kept incrementally
+"""
+import collections
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Key counted for documents without a value in a dimension
+UNSPECIFIED = 'unspecified'
+
+# (dimension, key, delta) applied to a CollectionStats
+Change = Tuple[str, str, int]
+
+
+def change_fields(changes: Iterable[Change]) -> Dict[str, int]:
+    """Changes summed into increments of ``dimension:key`` fields"""
+    amounts: Dict[str, int] = collections.defaultdict(int)
+    for name, key, delta in changes:
+        amounts[f'{name}:{key}'] += delta
+    return dict(amounts)
+
+
+def field_value(field: str) -> Callable[[Dict[str, Any]], str]:
+    """Dimension keyed by a document field"""
+    def key(data: Dict[str, Any]) -> str:
+        value = data.get(field)
+        return str(value) if value not in (None, '') else UNSPECIFIED
+    return key
+
+
+def day_of(field: str, zone: Optional[tzinfo] = None) -> Callable[[Dict[str, Any]], str]:
+    """Dimension keyed by the ISO date of a timestamp field, in ``zone`` when given.
+
+    Timestamps without a time zone are taken to be UTC.
+    """
+    def key(data: Dict[str, Any]) -> str:
+        value = data.get(field)
+        if isinstance(value, datetime):
+            if zone is not None:
+                value = (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).astimezone(zone)
+            return value.date().isoformat()
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, str) and len(value) >= 10:
+            return value[:10]
+        return UNSPECIFIED
+    return key
+
+
+class CollectionStats:
+    """Counts of one collection's documents per key of each dimension.
+
+    Writers turn every create or update into (dimension, key, delta)
+    changes, which are applied here and can be relayed as they are to
+    other workers, so reading the figures never touches the database.
+    The total is the sum over the first dimension.
+    """
+
+    def __init__(self, dimensions: Dict[str, Callable[[Dict[str, Any]], str]]):
+        self.dimensions = dimensions
+        self._counts: Dict[str, collections.Counter] = {name: collections.Counter() for name in dimensions}
+
+    def changes(self, data: Dict[str, Any], delta: int = 1) -> List[Change]:
+        """Changes that count a document in (delta 1) or out (delta -1)"""
+        return [(name, key(data), delta) for name, key in self.dimensions.items()]
+
+    def moved(self, before: Dict[str, Any], after: Dict[str, Any]) -> List[Change]:
+        """Changes for a document updated from ``before`` to ``after``"""
+        changes = []
+        for name, key in self.dimensions.items():
+            old, new = key(before), key(after)
+            if old != new:
+                changes.extend(((name, old, -1), (name, new, 1)))
+        return changes
+
+    def apply(self, changes: Iterable[Change]):
+        for name, key, delta in changes:
+            counts = self._counts.get(name)
+            if counts is None:
+                continue
+            counts[key] += delta
+            if counts[key] <= 0:
+                del counts[key]
+
+    def snapshot(self, days: Optional[int] = None, today: Optional[date] = None) -> Dict[str, Any]:
+        """Total and per-key counts.
+
+        ``days`` limits the ``day`` dimension to the calendar days ending
+        ``today``, each present even when it counted nothing.
+        """
+        first = next(iter(self._counts.values()), collections.Counter())
+        result: Dict[str, Any] = {'total': sum(first.values())}
+        for name, counts in self._counts.items():
+            if name == 'day':
+                if days is None:
+                    keys = sorted(key for key in counts if key != UNSPECIFIED)
+                else:
+                    today = today or date.today()
+                    keys = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+                result['by_day'] = {key: counts.get(key, 0) for key in keys}
+            else:
+                result[f'by_{name}'] = dict(counts.most_common())
+        return result
+
+    def fields(self) -> Dict[str, int]:
+        """Counts as flat ``dimension:key`` fields, the form kept in shared state"""
+        return {f'{name}:{key}': count for name, counts in self._counts.items() for key, count in counts.items()}
+
+    def load_fields(self, fields: Dict[str, int]):
+        """Take counts from ``dimension:key`` fields; fields of no known dimension are ignored"""
+        self._counts = {name: collections.Counter() for name in self.dimensions}
+        for field, count in fields.items():
+            name, separator, key = field.partition(':')
+            if separator and name in self._counts and count > 0:
+                self._counts[name][key] = count
+
+    def replace(self, other: 'CollectionStats'):
+        """Take over the counts of ``other``, e.g. one filled by a scan of the collection"""
+        self._counts = other._counts
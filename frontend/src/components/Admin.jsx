@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Calendar, Clock, Mail, Phone, Building, User, Filter, RefreshCw, CheckCircle, XCircle, AlertCircle, Eye } from 'lucide-react';
 import { Button } from './ui/button';
 import ScrollReveal from './ScrollReveal';
@@ -11,11 +11,57 @@ const Admin = () => {
   const [statusFilter, setStatusFilter] = useState('');
   const [selectedAppointment, setSelectedAppointment] = useState(null);
   const [updatingStatus, setUpdatingStatus] = useState(null);
+  const [stats, setStats] = useState(null);
+  const statusFilterRef = useRef(statusFilter);
+  const fetchAppointmentsRef = useRef(null);
 
   useEffect(() => {
+    fetchStats();
+  }, []);
+
+  useEffect(() => {
+    statusFilterRef.current = statusFilter;
     fetchAppointments();
   }, [statusFilter]);
 
+  // Keep the list current from the server's change stream instead of refetching
+  useEffect(() => {
+    const source = new EventSource(`${process.env.REACT_APP_BACKEND_URL}/api/appointments/stream`);
+    // Counts are kept by the server, so refreshing them on every change is cheap
+    const onAppointment = (event) => {
+      applyAppointmentChange(JSON.parse(event.data));
+      fetchStats();
+    };
+    const onReload = () => {
+      fetchAppointmentsRef.current();
+      fetchStats();
+    };
+
+    source.addEventListener('appointment.created', onAppointment);
+    source.addEventListener('appointment.updated', onAppointment);
+    source.addEventListener('appointment.imported', onReload);
+    source.addEventListener('contact.created', fetchStats);
+    source.addEventListener('contact.imported', fetchStats);
+    source.addEventListener('reset', onReload);
+
+    return () => source.close();
+  }, []);
+
+  const applyAppointmentChange = (appointment) => {
+    const filter = statusFilterRef.current;
+    setAppointments(prevAppointments => {
+      const others = prevAppointments.filter(apt => apt.id !== appointment.id);
+      if (filter && appointment.status !== filter) {
+        return others;
+      }
+      if (others.length < prevAppointments.length) {
+        return prevAppointments.map(apt => (apt.id === appointment.id ? appointment : apt));
+      }
+      return [appointment, ...others].sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+    });
+    setSelectedAppointment(prev => (prev && prev.id === appointment.id ? appointment : prev));
+  };
+
   const fetchAppointments = async () => {
     setLoading(true);
     setError('');
@@ -41,6 +87,18 @@ const Admin = () => {
       setLoading(false);
     }
   };
+  fetchAppointmentsRef.current = fetchAppointments;
+
+  const fetchStats = async () => {
+    try {
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/stats?days=0`);
+      if (response.ok) {
+        setStats(await response.json());
+      }
+    } catch (error) {
+      console.error('Error fetching stats:', error);
+    }
+  };
 
   const updateAppointmentStatus = async (appointmentId, newStatus) => {
     setUpdatingStatus(appointmentId);
@@ -119,7 +177,7 @@ const Admin = () => {
 
   const formatTime = (timeString) => {
     const [hour, minute] = timeString.split(':');
-    const hourInt = parseInt(hour);
+    const hourInt = parseInt(hour) % 24;
     const period = hourInt >= 12 ? 'PM' : 'AM';
     const displayHour = hourInt > 12 ? hourInt - 12 : hourInt === 0 ? 12 : hourInt;
     return `${displayHour}:${minute} ${period}`;
@@ -137,12 +195,14 @@ const Admin = () => {
   };
 
   const getAppointmentCounts = () => {
+    const byStatus = stats ? stats.appointments.by_status : {};
     const counts = {
-      total: appointments.length,
-      pending: appointments.filter(apt => apt.status === 'pending').length,
-      confirmed: appointments.filter(apt => apt.status === 'confirmed').length,
-      completed: appointments.filter(apt => apt.status === 'completed').length,
-      cancelled: appointments.filter(apt => apt.status === 'cancelled').length,
+      total: stats ? stats.appointments.total : 0,
+      pending: byStatus.pending || 0,
+      confirmed: byStatus.confirmed || 0,
+      completed: byStatus.completed || 0,
+      cancelled: byStatus.cancelled || 0,
+      newLeads: stats ? stats.contact_forms.by_status.new || 0 : 0,
     };
     return counts;
   };
@@ -167,7 +227,7 @@ const Admin = () => {
 
         {/* Stats Cards */}
         <ScrollReveal delay={0.3}>
-          <div className="grid md:grid-cols-2 lg:grid-cols-5 gap-4 mb-8">
+          <div className="grid md:grid-cols-3 lg:grid-cols-6 gap-4 mb-8">
             <GlassBox className="p-4 text-center" blur={16} opacity={0.1}>
               <div className="text-2xl font-bold text-[#00FFD1]">{counts.total}</div>
               <div className="text-sm text-white/70">Total</div>
@@ -188,6 +248,10 @@ const Admin = () => {
               <div className="text-2xl font-bold text-red-400">{counts.cancelled}</div>
               <div className="text-sm text-white/70">Cancelled</div>
             </GlassBox>
+            <GlassBox className="p-4 text-center" blur={16} opacity={0.1}>
+              <div className="text-2xl font-bold text-[#00FFD1]">{counts.newLeads}</div>
+              <div className="text-sm text-white/70">New Leads</div>
+            </GlassBox>
           </div>
         </ScrollReveal>
 
@@ -404,8 +468,17 @@ const Admin = () => {
                         </div>
                         <div className="flex items-center space-x-2 text-white/70">
                           <Clock className="w-3 h-3" />
-                          <span>{formatTime(selectedAppointment.appointment_time)}</span>
+                          <span>
+                            {formatTime(selectedAppointment.appointment_time)}
+                            {selectedAppointment.end_time && ` – ${formatTime(selectedAppointment.end_time)}`}
+                          </span>
                         </div>
+                        {selectedAppointment.consultant && (
+                          <div className="flex items-center space-x-2 text-white/70">
+                            <User className="w-3 h-3" />
+                            <span>{selectedAppointment.consultant}</span>
+                          </div>
+                        )}
                       </div>
                     </div>
 
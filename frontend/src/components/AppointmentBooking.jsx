@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useForm } from 'react-hook-form';
 import { Calendar, Clock, Send, CheckCircle, AlertCircle, Loader2, User, Mail, Phone, Building, Briefcase, Target } from 'lucide-react';
 import { Button } from './ui/button';
@@ -11,8 +11,10 @@ const AppointmentBooking = () => {
   const [submitMessage, setSubmitMessage] = useState('');
   const [selectedDate, setSelectedDate] = useState('');
   const [availableTimeSlots, setAvailableTimeSlots] = useState([]);
-  const [bookedTimes, setBookedTimes] = useState([]);
+  const [nextOpenSlots, setNextOpenSlots] = useState([]);
   const [loadingAvailability, setLoadingAvailability] = useState(false);
+  // Time picked from the next-open list, selected once its date has loaded
+  const pendingTime = useRef('');
 
   const {
     register,
@@ -35,19 +37,24 @@ const AppointmentBooking = () => {
     }
   });
 
-  // Generate time slots (9 AM to 6 PM, 30-minute intervals)
-  const generateTimeSlots = () => {
-    const slots = [];
-    for (let hour = 9; hour < 18; hour++) {
-      for (let minute = 0; minute < 60; minute += 30) {
-        const time = `${hour.toString().padStart(2, '0')}:${minute.toString().padStart(2, '0')}`;
-        slots.push(time);
-      }
+  // Open start times within business hours, computed by the server
+  const fetchFreeSlots = async (from, to, limit) => {
+    const response = await fetch(
+      `${process.env.REACT_APP_BACKEND_URL}/api/appointments/free-slots?from=${from}&to=${to}&limit=${limit}`
+    );
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.detail || 'Failed to load free slots');
     }
-    return slots;
+    return data.slots;
   };
 
-  const allTimeSlots = generateTimeSlots();
+  // Offer the next few openings across the whole bookable range in one request
+  useEffect(() => {
+    fetchFreeSlots(getMinDate(), getMaxDate(), 6)
+      .then(setNextOpenSlots)
+      .catch((error) => console.error('Error loading next open slots:', error));
+  }, []);
 
   // Check availability when date changes
   useEffect(() => {
@@ -59,20 +66,16 @@ const AppointmentBooking = () => {
   const checkAvailability = async (date) => {
     setLoadingAvailability(true);
     try {
-      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/appointments/availability?date=${date}`);
-      const data = await response.json();
-      
-      if (response.ok) {
-        setBookedTimes(data.booked_times || []);
-        setAvailableTimeSlots(allTimeSlots.filter(time => !data.booked_times?.includes(time)));
-      } else {
-        console.error('Failed to check availability:', data);
-        setAvailableTimeSlots(allTimeSlots); // Fallback to all slots
+      const times = (await fetchFreeSlots(date, date, 100)).map((slot) => slot.time);
+      setAvailableTimeSlots(times);
+      if (pendingTime.current && times.includes(pendingTime.current)) {
+        setValue('appointment_time', pendingTime.current);
       }
     } catch (error) {
       console.error('Error checking availability:', error);
-      setAvailableTimeSlots(allTimeSlots); // Fallback to all slots
+      setAvailableTimeSlots([]);
     } finally {
+      pendingTime.current = '';
       setLoadingAvailability(false);
     }
   };
@@ -98,7 +101,7 @@ const AppointmentBooking = () => {
         reset();
         setSelectedDate('');
         setAvailableTimeSlots([]);
-        setBookedTimes([]);
+        fetchFreeSlots(getMinDate(), getMaxDate(), 6).then(setNextOpenSlots).catch(() => {});
         
         // Reset status after 5 seconds
         setTimeout(() => {
@@ -130,6 +133,17 @@ const AppointmentBooking = () => {
     setValue('appointment_time', ''); // Reset time when date changes
   };
 
+  const pickOpenSlot = (slot) => {
+    setValue('appointment_date', slot.date);
+    if (slot.date === selectedDate && availableTimeSlots.includes(slot.time)) {
+      setValue('appointment_time', slot.time);
+      return;
+    }
+    pendingTime.current = slot.time;
+    setSelectedDate(slot.date);
+    setValue('appointment_time', '');
+  };
+
   const isFormValid = () => {
     const formData = watch();
     return formData.name && 
@@ -439,15 +453,33 @@ const AppointmentBooking = () => {
                       <p className="text-red-400 text-sm mt-1">{errors.appointment_time.message}</p>
                     )}
                     
-                    {/* Show booked times info */}
-                    {selectedDate && bookedTimes.length > 0 && (
+                    {selectedDate && !loadingAvailability && availableTimeSlots.length === 0 && (
                       <p className="text-white/50 text-xs mt-1">
-                        Unavailable times: {bookedTimes.map(formatTimeSlot).join(', ')}
+                        No open times on this date. Please pick another day.
                       </p>
                     )}
                   </div>
                 </div>
 
+                {nextOpenSlots.length > 0 && (
+                  <div>
+                    <p className="text-sm font-medium text-white/80 mb-2">Next available</p>
+                    <div className="flex flex-wrap gap-2">
+                      {nextOpenSlots.map((slot) => (
+                        <button
+                          key={`${slot.date}-${slot.time}`}
+                          type="button"
+                          onClick={() => pickOpenSlot(slot)}
+                          disabled={isSubmitting}
+                          className="bg-white/5 border border-white/20 text-white/80 text-sm px-3 py-2 hover:border-[#00FFD1] hover:text-[#00FFD1] transition-all duration-300 rounded-none"
+                        >
+                          {slot.date} · {formatTimeSlot(slot.time)}
+                        </button>
+                      ))}
+                    </div>
+                  </div>
+                )}
+
                 {/* Additional Message */}
                 <div>
                   <label className="block text-sm font-medium text-white/80 mb-2">
@@ -0,0 +1,41 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules import each other by name, as when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+# Settings are read at import; keep the app in memory, in one process
+os.environ.update({
+    'DATABASE_BACKEND': 'local',
+    'LOCAL_DB_PATH': '',
+    'SHARED_STATE_URL': '',
+    'WRITE_BEHIND_ENABLED': 'False',
+    'RATE_LIMIT_ENABLED': 'False',
+    'LOG_ASYNC': 'False',
+    'LOG_LEVEL': 'WARNING',
+})
+
+
+@pytest.fixture(scope='session')
+def client():
+    from fastapi.testclient import TestClient
+
+    import server
+
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def store():
+    """The in-memory local store behind the app, emptied of test collections"""
+    from database import firebase_db
+
+    store = firebase_db.db.store
+    for collection_name in ('status_checks', 'contact_forms', 'appointments'):
+        for doc_id in [doc_id for doc_id, _ in store.query(collection_name, [])]:
+            store.delete(collection_name, doc_id)
+    return store
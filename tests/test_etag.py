@@ -0,0 +1,43 @@
+def test_unchanged_listing_is_not_modified(client, store):
+    first = client.get('/api/status', params={'limit': 10})
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/api/status', params={'limit': 10}, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert again.content == b''
+
+
+def test_etag_depends_on_the_query(client, store):
+    etag = client.get('/api/status', params={'limit': 10}).headers['ETag']
+
+    other = client.get('/api/status', params={'limit': 5}, headers={'If-None-Match': etag})
+    assert other.status_code == 200
+    assert other.headers['ETag'] != etag
+
+
+def test_write_changes_the_etag(client, store):
+    etag = client.get('/api/status', params={'limit': 10}).headers['ETag']
+    assert client.post('/api/status', json={'client_name': 'probe'}).status_code == 200
+
+    after = client.get('/api/status', params={'limit': 10}, headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert [item['client_name'] for item in after.json()] == ['probe']
+
+
+def test_availability_etag_follows_bookings(client, store):
+    params = {'date': '2031-03-03'}
+    etag = client.get('/api/appointments/availability', params=params).headers['ETag']
+    assert client.get('/api/appointments/availability', params=params,
+                      headers={'If-None-Match': f'"other", {etag}'}).status_code == 304
+
+    booked = client.post('/api/appointments', json={
+        'name': 'A', 'email': 'a@example.com', 'phone': '5551234567',
+        'appointment_date': '2031-03-03', 'appointment_time': '10:00',
+    })
+    assert booked.status_code == 200
+    after = client.get('/api/appointments/availability', params=params, headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.json()['booked_times'] == ['10:00']
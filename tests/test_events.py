@@ -0,0 +1,63 @@
+import asyncio
+
+from events import RESET_EVENT, ChangeFeed
+
+
+def received(feed, last_event_id=None, publish=()):
+    """Event (id, type) pairs a client gets on connecting, after ``publish`` arrives live"""
+    async def run():
+        stream = feed.stream(last_event_id)
+        assert await stream.__anext__() == b'retry: 3000\n\n'
+        for event_type, data in publish:
+            feed.publish(event_type, data)
+        events = []
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), 0.05)
+            except asyncio.TimeoutError:
+                break
+            lines = dict(line.split(b': ', 1) for line in chunk.strip().split(b'\n'))
+            events.append((lines[b'id'].decode(), lines[b'event'].decode()))
+        await stream.aclose()
+        return events
+
+    return asyncio.run(run())
+
+
+def test_reconnecting_client_gets_only_missed_events():
+    feed = ChangeFeed()
+    for n in range(3):
+        feed.publish('appointment.created', {'n': n})
+
+    assert received(feed, f'{feed.feed_id}:1') == [
+        (f'{feed.feed_id}:2', 'appointment.created'),
+        (f'{feed.feed_id}:3', 'appointment.created'),
+    ]
+    assert received(feed, f'{feed.feed_id}:3') == []
+
+
+def test_live_events_follow_replayed_ones():
+    feed = ChangeFeed()
+    feed.publish('contact.created', {})
+
+    assert received(feed, f'{feed.feed_id}:0', publish=[('appointment.updated', {})]) == [
+        (f'{feed.feed_id}:1', 'contact.created'),
+        (f'{feed.feed_id}:2', 'appointment.updated'),
+    ]
+
+
+def test_unknown_or_expired_ids_get_a_reset():
+    feed = ChangeFeed(replay=2)
+    for n in range(4):
+        feed.publish('appointment.created', {'n': n})
+
+    assert received(feed, f'{feed.feed_id}:1') == [(f'{feed.feed_id}:4', RESET_EVENT)]
+    assert received(feed, 'another-worker:3') == [(f'{feed.feed_id}:4', RESET_EVENT)]
+    assert received(feed, 'garbage') == [(f'{feed.feed_id}:4', RESET_EVENT)]
+
+
+def test_slow_subscriber_gets_a_reset_instead_of_a_backlog():
+    feed = ChangeFeed(queue_size=2)
+
+    events = received(feed, publish=[('appointment.created', {'n': n}) for n in range(3)])
+    assert events == [(f'{feed.feed_id}:3', RESET_EVENT)]
@@ -0,0 +1,151 @@
+import pytest
+
+from local_store import CorruptLogError, LocalStore
+
+ACTIVE = [('status', 'in', ['pending', 'confirmed'])]
+
+
+def booking(start, end, status='pending', date='2031-01-01', consultant='ana'):
+    return {'appointment_date': date, 'consultant': consultant, 'start_time': start,
+            'end_time': end, 'status': status}
+
+
+def create(store, doc_id, data):
+    return store.create_if_absent('appointments', doc_id, data, ('appointment_date', 'consultant'),
+                                  ACTIVE, interval=('start_time', 'end_time'))
+
+
+def test_log_is_replayed_on_startup(tmp_path):
+    path = tmp_path / 'db.jsonl'
+    store = LocalStore(str(path))
+    store.set('contacts', 'a', {'name': 'A'})
+    store.set('contacts', 'b', {'name': 'B'})
+    store.update('contacts', 'a', {'name': 'A2'})
+    store.delete('contacts', 'b')
+    store.close()
+
+    reopened = LocalStore(str(path))
+    assert reopened.get('contacts', 'a') == {'name': 'A2'}
+    assert reopened.get('contacts', 'b') is None
+
+
+def test_torn_final_record_is_truncated(tmp_path):
+    path = tmp_path / 'db.jsonl'
+    store = LocalStore(str(path))
+    store.set('contacts', 'a', {'name': 'A'})
+    store.close()
+    intact = path.read_bytes()
+    with open(path, 'ab') as log:
+        log.write(b'{"op":"set","c":"contacts","id":"b","d":{"na')
+
+    reopened = LocalStore(str(path))
+    assert reopened.get('contacts', 'a') == {'name': 'A'}
+    assert reopened.get('contacts', 'b') is None
+    assert path.read_bytes() == intact
+
+
+def test_corrupt_record_before_others_raises_and_keeps_file(tmp_path):
+    path = tmp_path / 'db.jsonl'
+    store = LocalStore(str(path))
+    store.set('contacts', 'a', {'name': 'A'})
+    store.close()
+    with open(path, 'ab') as log:
+        log.write(b'not json\n{"op":"set","c":"contacts","id":"b","d":{}}\n')
+    damaged = path.read_bytes()
+
+    with pytest.raises(CorruptLogError):
+        LocalStore(str(path))
+    assert path.read_bytes() == damaged
+
+
+def test_writes_after_compaction_survive_restart(tmp_path):
+    path = tmp_path / 'db.jsonl'
+    store = LocalStore(str(path))
+    for n in range(5):
+        store.set('contacts', 'a', {'n': n})
+    store.compact()
+    store.update('contacts', 'a', {'m': 1})
+    store.close()
+
+    assert len(path.read_text().splitlines()) == 2
+    assert LocalStore(str(path)).get('contacts', 'a') == {'n': 4, 'm': 1}
+
+
+def test_create_if_absent_rejects_overlapping_interval():
+    store = LocalStore()
+    assert create(store, 'a', booking(600, 660))
+    assert not create(store, 'b', booking(630, 690))
+    assert store.get('appointments', 'b') is None
+
+
+def test_create_if_absent_allows_adjacent_and_unrelated_bookings():
+    store = LocalStore()
+    assert create(store, 'a', booking(600, 660))
+    assert create(store, 'b', booking(660, 720))
+    assert create(store, 'c', booking(600, 660, consultant='ben'))
+    assert create(store, 'd', booking(600, 660, date='2031-01-02'))
+
+
+def test_inactive_bookings_do_not_conflict():
+    store = LocalStore()
+    assert create(store, 'a', booking(600, 660, status='cancelled'))
+    assert create(store, 'b', booking(600, 660))
+
+
+def test_create_many_if_absent_checks_within_the_batch():
+    store = LocalStore()
+    assert create(store, 'a', booking(600, 660))
+    created = store.create_many_if_absent(
+        'appointments',
+        [('b', booking(630, 690)), ('c', booking(700, 760)), ('d', booking(730, 790))],
+        ('appointment_date', 'consultant'), ACTIVE, interval=('start_time', 'end_time'),
+    )
+    assert created == [False, True, False]
+    assert store.count('appointments') == 2
+
+
+def test_update_if_absent_refuses_reactivation_over_a_booking():
+    store = LocalStore()
+    assert create(store, 'old', booking(600, 660, status='cancelled'))
+    assert create(store, 'new', booking(600, 660))
+
+    result = store.update_if_absent('appointments', 'old', {'status': 'confirmed'},
+                                    ('appointment_date', 'consultant'), ACTIVE,
+                                    interval=('start_time', 'end_time'))
+    assert result is None
+    assert store.get('appointments', 'old')['status'] == 'cancelled'
+
+
+def test_update_if_absent_returns_previous_document():
+    store = LocalStore()
+    assert create(store, 'a', booking(600, 660))
+
+    result = store.update_if_absent('appointments', 'a', {'status': 'confirmed'},
+                                    ('appointment_date', 'consultant'), ACTIVE,
+                                    interval=('start_time', 'end_time'))
+    assert result['status'] == 'pending'
+    assert store.get('appointments', 'a')['status'] == 'confirmed'
+
+
+def test_update_if_absent_missing_document_raises():
+    with pytest.raises(KeyError):
+        LocalStore().update_if_absent('appointments', 'missing', {'status': 'confirmed'},
+                                      ('appointment_date', 'consultant'), ACTIVE)
+
+
+def test_final_record_without_newline_is_truncated(tmp_path):
+    path = tmp_path / 'db.jsonl'
+    store = LocalStore(str(path))
+    store.set('contacts', 'a', {'name': 'A'})
+    store.set('contacts', 'b', {'name': 'B'})
+    store.close()
+    path.write_bytes(path.read_bytes()[:-1])
+
+    reopened = LocalStore(str(path))
+    assert reopened.get('contacts', 'b') is None
+    reopened.set('contacts', 'c', {'name': 'C'})
+    reopened.close()
+
+    restarted = LocalStore(str(path))
+    assert restarted.get('contacts', 'a') == {'name': 'A'}
+    assert restarted.get('contacts', 'c') == {'name': 'C'}
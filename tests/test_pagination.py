@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from database import CURSOR_ID_FIELD, decode_cursor, encode_cursor, firebase_db
+
+
+def pages(client, path):
+    cursor, seen = None, []
+    while True:
+        response = client.get(path, params={'limit': 2, **({'start_after': cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.append([item['id'] for item in response.json()])
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return seen
+
+
+def test_pages_cover_documents_with_tied_sort_keys_once(client, store):
+    tied = datetime(2031, 1, 1, 12)
+    for n in range(5):
+        store.set('status_checks', f'check-{n}', {'id': f'check-{n}', 'client_name': 'x', 'timestamp': tied})
+    store.set('status_checks', 'newest', {'id': 'newest', 'client_name': 'x', 'timestamp': datetime(2031, 1, 2)})
+
+    seen = pages(client, '/api/status')
+    ids = [doc_id for page in seen for doc_id in page]
+    assert ids[0] == 'newest'
+    assert sorted(ids[1:]) == [f'check-{n}' for n in range(5)]
+    assert all(len(page) <= 2 for page in seen)
+
+
+def test_cursor_round_trips_and_checks_the_field(store):
+    store.set('status_checks', 'a', {'id': 'a', 'timestamp': datetime(2031, 1, 1)})
+    doc = firebase_db.get_collection('status_checks').document('a').get()
+
+    cursor = encode_cursor(doc, 'timestamp')
+    assert decode_cursor(cursor, 'timestamp') == {'timestamp': datetime(2031, 1, 1), CURSOR_ID_FIELD: 'a'}
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 'created_at')
+
+
+def test_invalid_cursor_is_rejected(client, store):
+    assert client.get('/api/status', params={'start_after': 'not-a-cursor'}).status_code == 400
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+import ratelimit
+from ratelimit import RateLimitMiddleware, SharedWindowLimiter, TokenBucketLimiter, _client_ip
+from shared_state import InProcessState
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    monkeypatch.setattr(ratelimit.time, 'time', clock)
+    return clock
+
+
+def scope(forwarded=(), client='10.0.0.1'):
+    headers = [(b'x-forwarded-for', value.encode('latin-1')) for value in forwarded]
+    return {'type': 'http', 'method': 'POST', 'path': '/api/contact', 'headers': headers, 'client': (client, 1234)}
+
+
+def test_token_bucket_allows_burst_then_limits(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=3)
+    assert [limiter.acquire('a') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire('a') == pytest.approx(1.0)
+    assert limiter.acquire('b') == 0.0
+
+
+def test_token_bucket_refills_at_rate(clock):
+    limiter = TokenBucketLimiter(rate=0.5, burst=2)
+    limiter.acquire('a')
+    limiter.acquire('a')
+    clock.now += 1.0
+    assert limiter.acquire('a') == pytest.approx(1.0)
+    clock.now += 1.0
+    assert limiter.acquire('a') == 0.0
+    clock.now += 100.0
+    # Refilling stops at the burst size
+    assert [limiter.acquire('a') for _ in range(3)][-1] > 0
+
+
+def test_token_bucket_sweeps_idle_buckets(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, shards=1)
+    limiter.acquire('a')
+    clock.now += ratelimit.SWEEP_INTERVAL
+    limiter.acquire('b')
+    assert len(limiter) == 1
+
+
+def test_shared_window_limits_each_window(clock):
+    limiter = SharedWindowLimiter(InProcessState(), 'ip', limit=2, window=60)
+    clock.now = 6000.0
+    assert [limiter.acquire('a') for _ in range(2)] == [0.0, 0.0]
+    clock.now += 15
+    assert limiter.acquire('a') == pytest.approx(45.0)
+    assert limiter.acquire('b') == 0.0
+    clock.now += 45
+    assert limiter.acquire('a') == 0.0
+
+
+def test_shared_window_keys_are_hashed(clock):
+    state = InProcessState()
+    SharedWindowLimiter(state, 'email', limit=1, window=60).acquire('someone@example.com')
+    assert not any('example.com' in key for key in state._counters)
+
+
+def test_client_ip_ignores_forwarded_for_unless_trusted():
+    assert _client_ip(scope(['1.2.3.4']), trust_proxy=False) == '10.0.0.1'
+
+
+def test_client_ip_uses_entry_added_by_trusted_proxy():
+    assert _client_ip(scope(['6.6.6.6, 1.2.3.4']), trust_proxy=True) == '1.2.3.4'
+    assert _client_ip(scope(['6.6.6.6', '1.2.3.4']), trust_proxy=True) == '1.2.3.4'
+    assert _client_ip(scope(['6.6.6.6, 1.2.3.4, 10.0.0.9']), trust_proxy=True, proxy_hops=2) == '1.2.3.4'
+    assert _client_ip(scope(['1.2.3.4']), trust_proxy=True, proxy_hops=2) == '1.2.3.4'
+    assert _client_ip(scope(), trust_proxy=True) == '10.0.0.1'
+
+
+def test_rotating_forwarded_for_does_not_bypass_limit(clock):
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    middleware = RateLimitMiddleware(app, ['/api/contact'], TokenBucketLimiter(rate=0.01, burst=2),
+                                     trust_proxy=True)
+
+    async def request(n):
+        statuses = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        await middleware(scope([f'203.0.113.{n}, 1.2.3.4']), receive, send)
+        return statuses[0]
+
+    statuses = [asyncio.run(request(n)) for n in range(5)]
+    assert statuses == [200, 200, 429, 429, 429]
@@ -0,0 +1,66 @@
+from datetime import date, datetime
+
+from slots import IntervalIndex, parse_business_hours
+
+HOURS = parse_business_hours('mon-sun 09:00-12:00')
+# A Wednesday
+DAY = date(2031, 1, 1)
+
+
+def test_overlapping_finds_only_intersecting_intervals():
+    index = IntervalIndex()
+    index.add('a', '2031-01-01', None, 600, 660)
+    index.add('b', '2031-01-01', None, 660, 720)
+    index.add('long', '2031-01-01', None, 540, 840)
+    index.add('other', '2031-01-01', 'ana', 600, 660)
+
+    assert index.overlapping('2031-01-01', None, 630, 650) == [(540, 840, 'long'), (600, 660, 'a')]
+    assert index.overlapping('2031-01-01', None, 840, 900) == []
+    assert index.overlapping('2031-01-02', None, 600, 660) == []
+
+
+def test_out_of_order_remove_and_add_converge():
+    index = IntervalIndex()
+    index.remove('a', '2031-01-01', None, 600, 660)
+    index.add('a', '2031-01-01', None, 600, 660)
+    assert index.overlapping('2031-01-01', None, 600, 660) == []
+
+
+def test_free_slots_skip_bookings():
+    index = IntervalIndex()
+    index.add('a', '2031-01-01', None, 570, 630)
+
+    slots = index.free_slots(DAY, DAY, None, 60, HOURS, limit=10)
+    assert slots == [('2031-01-01', 630), ('2031-01-01', 660)]
+
+
+def test_free_slots_respect_limit_and_later_days():
+    index = IntervalIndex()
+    index.add('a', '2031-01-01', None, 540, 720)
+
+    slots = index.free_slots(DAY, date(2031, 1, 3), None, 30, HOURS, limit=2)
+    assert slots == [('2031-01-02', 540), ('2031-01-02', 570)]
+
+
+def test_free_slots_never_offer_past_starts():
+    index = IntervalIndex()
+    now = datetime(2031, 1, 1, 10, 0)
+
+    slots = index.free_slots(date(2030, 12, 31), DAY, None, 30, HOURS, limit=10, not_before=now)
+    # 10:00 itself has already begun
+    assert slots == [('2031-01-01', 630), ('2031-01-01', 660), ('2031-01-01', 690)]
+
+
+def test_reconcile_repairs_missed_changes():
+    index = IntervalIndex()
+    index.add('kept', '2031-01-01', None, 540, 570)
+    index.add('ghost', '2031-01-01', None, 600, 630)
+    index.add('busy', '2031-01-01', None, 660, 690)
+
+    repaired = index.reconcile([
+        ('kept', '2031-01-01', None, 540, 570),
+        ('missed', '2031-01-01', None, 630, 660),
+    ], skip=['busy'])
+
+    assert repaired == 2
+    assert [interval[2] for interval in index.intervals('2031-01-01')] == ['kept', 'missed', 'busy']
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from stats import UNSPECIFIED, CollectionStats, change_fields, day_of, field_value
+
+
+def stats():
+    return CollectionStats({'status': field_value('status'), 'industry': field_value('industry')})
+
+
+def test_changes_count_documents_in_and_out():
+    counts = stats()
+    counts.apply(counts.changes({'status': 'new', 'industry': 'tech'}))
+    counts.apply(counts.changes({'status': 'new'}))
+    counts.apply(counts.changes({'status': 'new', 'industry': 'tech'}, delta=-1))
+
+    snapshot = counts.snapshot()
+    assert snapshot['total'] == 1
+    assert snapshot['by_status'] == {'new': 1}
+    assert snapshot['by_industry'] == {UNSPECIFIED: 1}
+
+
+def test_moved_only_changes_dimensions_that_differ():
+    counts = stats()
+    before = {'status': 'pending', 'industry': 'tech'}
+    after = {'status': 'confirmed', 'industry': 'tech'}
+
+    assert counts.moved(before, after) == [('status', 'pending', -1), ('status', 'confirmed', 1)]
+    counts.apply(counts.changes(before))
+    counts.apply(counts.moved(before, after))
+    assert counts.snapshot()['by_status'] == {'confirmed': 1}
+
+
+def test_fields_round_trip_through_shared_form():
+    counts = stats()
+    changes = counts.changes({'status': 'new', 'industry': 'tech'}) * 2
+    fields = change_fields(changes)
+    assert fields == {'status:new': 2, 'industry:tech': 2}
+
+    shared = stats()
+    shared.load_fields({**fields, 'counted': 1, 'status:old': 0})
+    counts.apply(changes)
+    assert shared.snapshot() == counts.snapshot()
+    assert shared.fields() == fields
+
+
+def test_snapshot_days_are_calendar_days_ending_today():
+    counts = CollectionStats({'status': field_value('status'), 'day': day_of('created_at')})
+    for created in (datetime(2031, 1, 1, 12), datetime(2031, 1, 9, 8), datetime(2031, 1, 9, 9)):
+        counts.apply(counts.changes({'status': 'new', 'created_at': created}))
+
+    snapshot = counts.snapshot(days=3, today=date(2031, 1, 10))
+    assert snapshot['by_day'] == {'2031-01-08': 0, '2031-01-09': 2, '2031-01-10': 0}
+    assert counts.snapshot(days=0, today=date(2031, 1, 10))['by_day'] == {}
+    assert counts.snapshot()['by_day'] == {'2031-01-01': 1, '2031-01-09': 2}
+
+
+def test_day_of_uses_the_given_zone():
+    key = day_of('created_at', ZoneInfo('America/New_York'))
+    # Stored timestamps are UTC; 03:00 UTC is still the previous evening in New York
+    assert key({'created_at': datetime(2031, 1, 10, 3)}) == '2031-01-09'
+    assert day_of('created_at')({'created_at': datetime(2031, 1, 10, 3)}) == '2031-01-10'
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from database import WriteBehindQueue
+
+
+class RecordingDB:
+    """Stands in for FirebaseDB, recording every committed set"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.committed = []
+
+    def get_collection(self, collection_name):
+        return RecordingCollection(collection_name)
+
+    def batch(self):
+        return RecordingBatch(self)
+
+
+class RecordingCollection:
+    def __init__(self, collection_name):
+        self.collection_name = collection_name
+
+    def document(self, doc_id):
+        return (self.collection_name, doc_id)
+
+
+class RecordingBatch:
+    def __init__(self, db):
+        self._db = db
+        self._sets = []
+
+    def set(self, reference, data):
+        self._sets.append((*reference, data))
+
+    def commit(self):
+        if self._db.fail:
+            raise ConnectionError("database unreachable")
+        self._db.committed.extend(self._sets)
+
+
+def queue(db, spool_path):
+    return WriteBehindQueue(db, str(spool_path), max_batch=10, flush_interval=0.01)
+
+
+def test_spooled_writes_are_replayed_exactly_once(tmp_path):
+    spool_path = tmp_path / 'write_behind.spool'
+    crashed = queue(RecordingDB(fail=True), spool_path)
+    crashed.start()
+    for n in range(3):
+        crashed.enqueue('contact_forms', f'form-{n}', {'n': n})
+    # Stopping while commits fail leaves the writes only in the spool, as a crash would
+    crashed.stop()
+
+    db = RecordingDB()
+    replayed = queue(db, spool_path)
+    replayed.start()
+    replayed.stop()
+    assert sorted(db.committed) == [('contact_forms', f'form-{n}', {'n': n}) for n in range(3)]
+
+    again = RecordingDB()
+    restarted = queue(again, spool_path)
+    restarted.start()
+    restarted.stop()
+    assert again.committed == []
+
+
+def test_acknowledged_writes_are_not_replayed(tmp_path):
+    spool_path = tmp_path / 'write_behind.spool'
+    records = [{'seq': n, 'c': 'contact_forms', 'id': f'form-{n}', 'd': {'n': n}} for n in (1, 2, 3)]
+    spool_path.write_text(''.join(json.dumps(record) + '\n' for record in records[:2]) +
+                          json.dumps({'ack': 2}) + '\n' + json.dumps(records[2]) + '\n' + '{"seq": 4, "c"')
+
+    db = RecordingDB(fail=True)
+    recovering = queue(db, spool_path)
+    recovering.start()
+    # The spool was rewritten to hold only the unacknowledged write
+    assert [json.loads(line) for line in spool_path.read_text().splitlines()] == [records[2]]
+    recovering.enqueue('contact_forms', 'form-5', {'n': 5})
+    recovering.stop()
+
+    db = RecordingDB()
+    replayed = queue(db, spool_path)
+    replayed.start()
+    replayed.stop()
+    assert db.committed == [('contact_forms', 'form-3', {'n': 3}), ('contact_forms', 'form-5', {'n': 5})]
+
+
+def test_each_queue_claims_its_own_spool(tmp_path):
+    pytest.importorskip('fcntl')
+    spool_path = tmp_path / 'write_behind.spool'
+    first, second = queue(RecordingDB(fail=True), spool_path), queue(RecordingDB(fail=True), spool_path)
+    first.start()
+    second.start()
+    try:
+        first.enqueue('contact_forms', 'a', {})
+        second.enqueue('contact_forms', 'b', {})
+        assert '"a"' in spool_path.read_text()
+        assert '"b"' in (tmp_path / 'write_behind.spool.1').read_text()
+    finally:
+        first.stop()
+        second.stop()